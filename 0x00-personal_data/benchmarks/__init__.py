@@ -0,0 +1,7 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the personal data redaction helpers.
+
+Run from the project directory: `python3 -m benchmarks` runs the whole
+redaction suite, `python3 -m benchmarks.filter_datum` a single one.
+"""
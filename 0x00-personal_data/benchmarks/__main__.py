@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Redaction benchmark suite.
+
+Usage: python3 -m benchmarks [--output FILE] [--baseline FILE]
+                             [--threshold RATIO] [--lines N]
+
+Times filter_datum, RedactingFormatter.format and get_logger over
+synthetic corpora of varying width, PII density and separator. Results
+are written as JSON; given a baseline from an earlier run, the suite
+exits with status 1 when any throughput drops by more than the
+threshold.
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+from benchmarks.corpus import generate_lines
+from filtered_logger import (
+        PII_FIELDS, RedactingFormatter, filter_datum, get_logger
+        )
+
+
+WIDTHS = (8, 32)
+DENSITIES = (0.0, 0.25, 1.0)
+SEPARATORS = (";", "|")
+
+
+def lines_per_second(func: Callable[[str], object], lines: List[str]) -> float:
+    """
+    Returns the throughput of func over lines, best of three runs.
+    """
+    best = 0.0
+    for _ in range(3):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = max(best, len(lines) / (time.perf_counter() - start))
+    return best
+
+
+def run(count: int) -> Dict[str, float]:
+    """
+    Runs every redaction path over every corpus.
+
+    Returns:
+        Lines/second keyed by `path/width/density/separator`.
+    """
+    formatter = RedactingFormatter(fields=PII_FIELDS)
+    logger = get_logger()
+    results = {}
+    with open(os.devnull, "w") as devnull:
+        for handler in logger.handlers:
+            handler.setStream(devnull)
+        for width in WIDTHS:
+            for density in DENSITIES:
+                for separator in SEPARATORS:
+                    lines = generate_lines(count, width, density, separator)
+                    paths = {"filter_datum": lambda line: filter_datum(
+                        PII_FIELDS, "***", line, separator)}
+                    if separator == RedactingFormatter.SEPARATOR:
+                        paths["formatter"] = lambda line: formatter.format(
+                            logging.makeLogRecord({"msg": line}))
+                        paths["get_logger"] = logger.info
+                    for path, func in paths.items():
+                        key = "{}/{}/{}/{}".format(
+                            path, width, density, separator)
+                        results[key] = lines_per_second(func, lines)
+                        print("{:<32} {:>12,.0f} lines/s".format(
+                            key, results[key]), file=sys.stderr)
+    return results
+
+
+def regressions(
+        results: Dict[str, float],
+        baseline: Dict[str, float],
+        threshold: float
+        ) -> List[str]:
+    """
+    Lists the benchmarks slower than baseline by more than threshold.
+    """
+    return ["{}: {:,.0f} -> {:,.0f} lines/s".format(
+        key, baseline[key], value)
+        for key, value in results.items()
+        if key in baseline and value < baseline[key] * (1 - threshold)]
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--output", default="bench_results.json",
+                        help="where the JSON results are written")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="tolerated throughput drop (default: 0.1)")
+    parser.add_argument("--lines", type=int, default=5000,
+                        help="lines per corpus (default: 5000)")
+    args = parser.parse_args()
+
+    results = run(args.lines)
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "lines": args.lines,
+            "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(results, json.load(f)["results"],
+                                 args.threshold)
+        for line in slower:
+            print("regression: " + line, file=sys.stderr)
+        if slower:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
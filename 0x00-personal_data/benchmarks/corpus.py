@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Synthetic user-row log lines for the redaction benchmarks.
+"""
+import random
+from typing import List
+
+from filtered_logger import PII_FIELDS
+
+
+def generate_lines(
+        count: int,
+        width: int = 8,
+        pii_density: float = 0.5,
+        separator: str = ";",
+        seed: int = 0
+        ) -> List[str]:
+    """
+    Generates log lines made of `key=value` pairs.
+
+    Args:
+        count: Number of lines.
+        width: Number of pairs per line.
+        pii_density: Share of the pairs whose key is in PII_FIELDS.
+        separator: Separator used between pairs.
+        seed: Seed of the random generator, for repeatable corpora.
+
+    Returns:
+        The generated lines.
+    """
+    rng = random.Random(seed)
+    pii = round(width * pii_density)
+    lines = []
+    for _ in range(count):
+        keys = [PII_FIELDS[i % len(PII_FIELDS)] for i in range(pii)] + \
+            ["column_{}".format(i) for i in range(width - pii)]
+        rng.shuffle(keys)
+        lines.append(separator.join(
+            "{}={}".format(key, "".join(
+                rng.choices("abcdefghijklmnopqrstuvwxyz0123456789@.-",
+                            k=rng.randint(4, 24))))
+            for key in keys) + separator)
+    return lines
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Acquire latency of get_db() with pooling on and off.
+
+No MySQL server is needed: connections come from a fake factory that
+simulates the TCP and auth handshake with a fixed delay.
+"""
+import os
+import sys
+import time
+
+import mysql.connector.pooling
+from mysql.connector.connection import MySQLConnection
+
+import filtered_logger
+
+
+HANDSHAKE = 0.002
+
+
+class FakeConnection(MySQLConnection):
+    """ MySQLConnection that only pretends to talk to a server """
+
+    def __init__(self, **kwargs):
+        """ Simulates the handshake of a new connection """
+        super(FakeConnection, self).__init__()
+        if kwargs:
+            time.sleep(HANDSHAKE)
+
+    def is_connected(self) -> bool:
+        """ A fake connection never goes away """
+        return True
+
+    def reconnect(self, *args, **kwargs):
+        """ Simulates the handshake of a reconnect """
+        time.sleep(HANDSHAKE)
+
+    def reset_session(self, *args, **kwargs):
+        """ Nothing to reset """
+
+    def close(self):
+        """ Nothing to close """
+
+
+def acquire_latency(acquisitions: int) -> float:
+    """
+    Returns the mean get_db() + close() latency in microseconds.
+    """
+    start = time.perf_counter()
+    for _ in range(acquisitions):
+        connection = filtered_logger.get_db()
+        connection.close()
+    return (time.perf_counter() - start) / acquisitions * 1e6
+
+
+def main(acquisitions: int = 2000):
+    """
+    Prints acquire latency with PERSONAL_DATA_DB_POOL_SIZE unset and set.
+    """
+    filtered_logger.MySQLConnection = FakeConnection
+    mysql.connector.pooling.connect = FakeConnection
+
+    os.environ["PERSONAL_DATA_DB_POOL_SIZE"] = "0"
+    print("no pool: {:>10.1f} us/acquire".format(
+        acquire_latency(acquisitions)))
+    os.environ["PERSONAL_DATA_DB_POOL_SIZE"] = "4"
+    print("pooled:  {:>10.1f} us/acquire".format(
+        acquire_latency(acquisitions)))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Redaction throughput as the number of fields grows from 5 to 1000.
+
+Every line carries the five PII_FIELDS plus three other columns; the
+extra field names only grow the set to match against. Before timing,
+both engines are checked to give byte-identical output to the original
+filter_datum.
+"""
+import sys
+import time
+from typing import Callable, Tuple
+
+from benchmarks.corpus import generate_lines
+from benchmarks.filter_datum import legacy_filter_datum
+from filtered_logger import (
+        PII_FIELDS, KeySetRedactor, compile_pattern_redactor
+        )
+
+
+LINE = ("name=Bob Dylan; email=bob@dylan.com; phone=(555) 555-5555; "
+        "ssn=000-123-0000; password=bcrypt_hash; ip=192.168.0.1; "
+        "last_login=2019-11-14 06:14:24; user_agent=Mozilla/5.0;")
+FIELD_COUNTS = (5, 10, 50, 100, 300, 1000)
+PARITY_LINES = (
+    LINE,
+    "ip=1;ssn=123-45|email=x",
+    "username=alice; name=x; a=name=b; =c; email=;",
+    "email=a=b|name=c;|phone=;ssn=x=|",
+    "name=a=name=; username=x=name=;ssn=",
+    "n,ax=e=;me=;nil=ie=; ",
+    )
+
+
+def check_parity(fields: Tuple[str, ...]):
+    """
+    Asserts that both engines redact PARITY_LINES and a generated
+    corpus as the original filter_datum does, with `;` and `|`
+    separators.
+    """
+    for separator in (";", "|"):
+        regex = compile_pattern_redactor(fields, "***", separator)
+        keyset = KeySetRedactor(fields, "***", separator)
+        lines = PARITY_LINES + tuple(generate_lines(
+            200, separator=separator))
+        for line in lines:
+            expected = legacy_filter_datum(fields, "***", line, separator)
+            assert regex(line) == expected, line
+            assert keyset(line) == expected, line
+
+
+def lines_per_second(redact: Callable[[str], str], lines: int) -> float:
+    """ Runs redact over LINE `lines` times and returns the throughput """
+    start = time.perf_counter()
+    for _ in range(lines):
+        redact(LINE)
+    return lines / (time.perf_counter() - start)
+
+
+def main(lines: int = 20000):
+    """
+    Prints lines/second of the regex and key-set engines per field count.
+    """
+    print("{:>6} {:>14} {:>14}".format("fields", "regex", "key set"))
+    for count in FIELD_COUNTS:
+        fields = tuple(PII_FIELDS) + tuple(
+            "field_{}".format(i) for i in range(count - len(PII_FIELDS)))
+        check_parity(fields)
+        regex = compile_pattern_redactor(fields, "***", ";")
+        keyset = KeySetRedactor(fields, "***", ";")
+        print("{:>6} {:>12,.0f}/s {:>12,.0f}/s".format(
+            count,
+            lines_per_second(regex, lines),
+            lines_per_second(keyset, lines)))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
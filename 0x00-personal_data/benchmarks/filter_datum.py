@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of filter_datum before and after pattern caching.
+"""
+import re
+import sys
+import time
+from typing import Callable, List
+
+from filtered_logger import PII_FIELDS, filter_datum
+
+
+LINE = ("name=Bob Dylan; email=bob@dylan.com; phone=(555) 555-5555; "
+        "ssn=000-123-0000; password=bcrypt_hash; ip=192.168.0.1; "
+        "last_login=2019-11-14 06:14:24; user_agent=Mozilla/5.0;")
+
+
+def legacy_filter_datum(
+        fields: List[str],
+        redaction: str,
+        message: str,
+        separator: str
+        ) -> str:
+    """
+    filter_datum as it was before the compiled redaction engine.
+    """
+    pattern = '|'.join([f'{field}=[^;{separator}]*' for field in fields])
+    return re.sub(
+            pattern,
+            lambda match: f"{match.group().split('=')[0]}={redaction}",
+            message
+            )
+
+
+def lines_per_second(func: Callable, lines: int) -> float:
+    """
+    Runs func over LINE `lines` times and returns the throughput.
+    """
+    start = time.perf_counter()
+    for _ in range(lines):
+        func(PII_FIELDS, "***", LINE, ";")
+    return lines / (time.perf_counter() - start)
+
+
+def main(lines: int = 200000):
+    """
+    Prints lines/second for the legacy and the cached implementation.
+    """
+    assert legacy_filter_datum(PII_FIELDS, "***", LINE, ";") == \
+        filter_datum(PII_FIELDS, "***", LINE, ";")
+    before = lines_per_second(legacy_filter_datum, lines)
+    after = lines_per_second(filter_datum, lines)
+    print("before: {:>12,.0f} lines/s".format(before))
+    print("after:  {:>12,.0f} lines/s".format(after))
+    print("speedup: {:.2f}x".format(after / before))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""
+bcrypt hashes/second as hash_many() gets more worker threads.
+"""
+import os
+import sys
+import time
+
+from encrypt_password import hash_many
+
+
+def main(passwords: int = 64):
+    """
+    Prints hashes/second for 1 up to 2 x CPU count workers.
+    """
+    batch = ["password{}".format(i) for i in range(passwords)]
+    workers = 1
+    while workers <= 2 * os.cpu_count():
+        start = time.perf_counter()
+        hash_many(batch, workers)
+        print("{:>3} workers: {:>8.1f} hashes/s".format(
+            workers, passwords / (time.perf_counter() - start)))
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of records pushed through get_logger().
+"""
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from filtered_logger import get_logger
+
+
+MESSAGE = ("name=Bob Dylan; email=bob@dylan.com; phone=(555) 555-5555; "
+           "ssn=000-123-0000; password=bcrypt_hash; ip=192.168.0.1; "
+           "last_login=2019-11-14 06:14:24; user_agent=Mozilla/5.0;")
+
+
+def bytes_per_record(logger: logging.Logger, records: int) -> float:
+    """
+    Returns the average peak of traced memory allocated by one record.
+    """
+    total = 0
+    tracemalloc.start()
+    for _ in range(records):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        logger.info(MESSAGE)
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / records
+
+
+def main(records: int = 1000000):
+    """
+    Prints records/second and allocated bytes per record.
+    """
+    logger = get_logger()
+    with open(os.devnull, "w") as devnull:
+        for handler in logger.handlers:
+            handler.setStream(devnull)
+        start = time.perf_counter()
+        for _ in range(records):
+            logger.info(MESSAGE)
+        elapsed = time.perf_counter() - start
+        allocated = bytes_per_record(logger, min(records, 10000))
+    print("records:  {:>12,}".format(records))
+    print("records/s: {:>11,.0f}".format(records / elapsed))
+    print("bytes allocated/record: {:,.0f}".format(allocated))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
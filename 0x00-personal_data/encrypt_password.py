@@ -3,9 +3,81 @@
 A is_valid function module.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+import asyncio
+import os
+import threading
+import time
 import bcrypt
 
 
+DEFAULT_ROUNDS = 12
+DEFAULT_MIN_ROUNDS = 10
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+_rounds: int = None
+_rounds_lock = threading.Lock()
+
+
+def calibrate_rounds(target_ms: float) -> int:
+    """
+    Picks the bcrypt work factor that fits a target latency on this host.
+    Each extra round doubles the cost, so one hash at the minimum cost
+    is enough to extrapolate; the pick is then checked once.
+    Args:
+        target_ms (float): Target duration of one hash in milliseconds.
+    Returns:
+        int: The highest work factor hashing within target_ms.
+    """
+    def measure(rounds: int) -> float:
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds))
+        return (time.perf_counter() - start) * 1000
+
+    rounds, elapsed = MIN_ROUNDS, measure(MIN_ROUNDS)
+    while rounds < MAX_ROUNDS and elapsed * 2 <= target_ms:
+        rounds, elapsed = rounds + 1, elapsed * 2
+    if rounds > MIN_ROUNDS and measure(rounds) > target_ms:
+        rounds -= 1
+    return rounds
+
+
+def min_rounds() -> int:
+    """
+    Returns the lowest work factor calibration may pick.
+    Read from PERSONAL_DATA_BCRYPT_MIN_ROUNDS, 10 by default, so a slow
+    or busy host never downgrades hashes below a safe cost.
+    Returns:
+        int: The security floor of the work factor.
+    """
+    floor = int(os.getenv("PERSONAL_DATA_BCRYPT_MIN_ROUNDS",
+                          str(DEFAULT_MIN_ROUNDS)))
+    return min(max(floor, MIN_ROUNDS), MAX_ROUNDS)
+
+
+def current_rounds() -> int:
+    """
+    Returns the work factor used for new hashes.
+    Calibrated once against PERSONAL_DATA_BCRYPT_TARGET_MS when it is
+    set, but never below min_rounds(); bcrypt's default otherwise.
+    This runs at import, under a lock, so concurrent logins neither
+    calibrate nor pick different costs.
+    Returns:
+        int: The work factor.
+    """
+    global _rounds
+
+    if _rounds is None:
+        with _rounds_lock:
+            if _rounds is None:
+                target_ms = os.getenv("PERSONAL_DATA_BCRYPT_TARGET_MS")
+                _rounds = max(calibrate_rounds(float(target_ms)),
+                              min_rounds()) if target_ms \
+                    else DEFAULT_ROUNDS
+    return _rounds
+
+
 def hash_password(password: str) -> bytes:
     """
     Hashes a password with bcrypt,
@@ -15,7 +87,7 @@ def hash_password(password: str) -> bytes:
     Returns:
         bytes: The hashed password with salt.
     """
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(current_rounds())
     hashed = bcrypt.hashpw(password.encode(), salt)
     return hashed
 
@@ -30,3 +102,97 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         bool: True if the password matches, False otherwise.
     """
     return bcrypt.checkpw(password.encode(), hashed_password)
+
+
+def needs_rehash(hashed_password: bytes) -> bool:
+    """
+    Tells whether a hash was made with another work factor than the
+    current one.
+    Args:
+        hashed_password (bytes): The stored hashed password.
+    Returns:
+        bool: True if the password should be hashed again.
+    """
+    return int(hashed_password.split(b"$")[2]) != current_rounds()
+
+
+def verify_and_rehash(
+        hashed_password: bytes,
+        password: str
+        ) -> Tuple[bool, Optional[bytes]]:
+    """
+    Validates a password and rehashes it if its work factor is outdated.
+    Args:
+        hashed_password (bytes): The hashed password to check against.
+        password (str): The plaintext password to validate.
+    Returns:
+        Tuple[bool, Optional[bytes]]: Whether the password matches, and
+        a new hash to store in place of the old one, or None.
+    """
+    if not is_valid(hashed_password, password):
+        return False, None
+    if needs_rehash(hashed_password):
+        return True, hash_password(password)
+    return True, None
+
+
+def hash_many(passwords: Iterable[str], workers: int = None) -> List[bytes]:
+    """
+    Hashes many passwords on a thread pool.
+    bcrypt releases the GIL while hashing, so threads run in parallel.
+    Args:
+        passwords (Iterable[str]): The passwords to hash.
+        workers (int): Number of threads, one per CPU by default.
+    Returns:
+        List[bytes]: The hashed passwords, in input order.
+    """
+    with ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+        return list(executor.map(hash_password, passwords))
+
+
+def verify_many(
+        pairs: Iterable[Tuple[bytes, str]],
+        workers: int = None
+        ) -> List[bool]:
+    """
+    Validates many passwords on a thread pool.
+    Args:
+        pairs (Iterable[Tuple[bytes, str]]): (hashed_password, password)
+            pairs to check.
+        workers (int): Number of threads, one per CPU by default.
+    Returns:
+        List[bool]: Whether each password matches, in input order.
+    """
+    with ThreadPoolExecutor(workers or os.cpu_count()) as executor:
+        return list(executor.map(lambda pair: is_valid(*pair), pairs))
+
+
+async def async_hash_password(password: str) -> bytes:
+    """
+    Hashes a password without blocking the event loop.
+    Args:
+        password (str): The password to hash.
+    Returns:
+        bytes: The hashed password with salt.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, hash_password, password)
+
+
+async def async_is_valid(hashed_password: bytes, password: str) -> bool:
+    """
+    Validates a password without blocking the event loop.
+    Args:
+        hashed_password (bytes): The hashed password to check against.
+        password (str): The plaintext password to validate.
+    Returns:
+        bool: True if the password matches, False otherwise.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+            None, is_valid, hashed_password, password
+            )
+
+
+# Calibrate at startup rather than inside the first login
+current_rounds()
@@ -2,12 +2,29 @@
 """
 A collection of modules
 """
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import atexit
 import logging
-from typing import List
+from logging.handlers import QueueHandler, QueueListener
+from queue import Empty, Full, Queue
+from typing import (
+        Any, Callable, Collection, Dict, Iterator, List, Mapping,
+        Optional, Tuple
+        )
+import copy
+import functools
+import random
 import re
 import os
+import sys
+import threading
+import time
 import mysql.connector
 from mysql.connector.connection import MySQLConnection
+from mysql.connector.cursor import MySQLCursor
+from mysql.connector.errors import PoolError
+from mysql.connector.pooling import MySQLConnectionPool
 
 
 """
@@ -15,6 +32,154 @@ Module for obfuscating specified fields in log messages
 """
 
 
+REDACTOR_CACHE_SIZE = 128
+KEYSET_THRESHOLD = 100
+
+
+def compile_pattern_redactor(
+        fields: Tuple[str, ...],
+        redaction: str,
+        separator: str
+        ) -> Callable[[str], str]:
+    """
+    Compiles a regex redaction engine for a set of fields
+
+    Each match is a field name, captured, its `=` and the value, as in
+    the original filter_datum(); the replacement is a `\\1=<redaction>`
+    template, which re expands in C from Python 3.12 on. Older versions
+    expand templates in Python, where a closure over the `=<redaction>`
+    suffix is faster. The cost of a scan grows with the number of fields.
+
+    Args:
+        fields: Tuple of fields to obfuscate.
+        redaction: String used to replace field values.
+        separator: Separator used between fields in the log line.
+
+    Returns:
+        A callable taking a log line and returning it obfuscated
+    """
+    if not fields:
+        return lambda message: message
+    pattern = re.compile('({})=[^;{}]*'.format(
+        '|'.join(re.escape(field) for field in fields),
+        re.escape(separator)
+        ))
+    suffix = '=' + redaction
+    if any('=' in field for field in fields):
+        # The original kept the part of the name before its first `=`
+        return functools.partial(
+            pattern.sub, lambda match: match[1].split('=')[0] + suffix)
+    if sys.version_info >= (3, 12):
+        return functools.partial(
+            pattern.sub, r'\1' + suffix.replace('\\', r'\\'))
+    return functools.partial(pattern.sub, lambda match: match[1] + suffix)
+
+
+class KeySetRedactor:
+    """ Redaction engine checking keys against a set of fields """
+
+    KEY_CACHE_SIZE = 4096
+
+    def __init__(
+            self,
+            fields: Collection[str],
+            redaction: str,
+            separator: str
+            ):
+        """
+        Initialize KeySetRedactor.
+
+        Args:
+            fields: Fields to obfuscate, none empty or containing `;`,
+                `=` or a character of separator.
+            redaction: String used to replace field values.
+            separator: Separator used between fields in the log line,
+                without `=`.
+        """
+        self.fields = frozenset(fields)
+        self.redaction = redaction
+        self.separator = separator
+        self._lengths = sorted({len(field) for field in self.fields})
+        self._keys: Dict[str, bool] = {}
+        self._split = re.compile(
+            '([;{}])'.format(re.escape(separator))).split
+
+    def __call__(self, message: str) -> str:
+        """
+        Obfuscates specified fields in a log line
+
+        Gives the same output as the regex engine: the line is cut at
+        `;` and at the separator, and in each piece the value after the
+        first `=` preceded by a field name, as a suffix like `username=`
+        for `name=`, is replaced. A key is looked up in the field set
+        once per distinct field length, so the cost does not depend on
+        the number of fields.
+
+        Args:
+            message: Original log line.
+
+        Returns:
+            A new log line with specified fields obfuscated
+        """
+        pieces = self._split(message)
+        for k in range(0, len(pieces), 2):
+            piece = pieces[k]
+            i = piece.find('=')
+            while i >= 0:
+                if self._keyed(piece[:i]):
+                    pieces[k] = piece[:i + 1] + self.redaction
+                    break
+                i = piece.find('=', i + 1)
+        return ''.join(pieces)
+
+    def _keyed(self, text: str) -> bool:
+        """
+        Tells whether text, the part of a piece before an `=`, ends with
+        a field name.
+
+        Lines repeat the same keys, so answers are memoized, up to
+        KEY_CACHE_SIZE of them.
+        """
+        keyed = self._keys.get(text)
+        if keyed is None:
+            keyed = any(text[len(text) - n:] in self.fields
+                        for n in self._lengths if n <= len(text))
+            if len(self._keys) >= self.KEY_CACHE_SIZE:
+                self._keys.clear()
+            self._keys[text] = keyed
+        return keyed
+
+
+@functools.lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def compile_redactor(
+        fields: Tuple[str, ...],
+        redaction: str,
+        separator: str
+        ) -> Callable[[str], str]:
+    """
+    Compiles the redaction engine for a set of fields
+
+    The engine is built once per (fields, redaction, separator) and
+    kept in a bounded LRU. Up to KEYSET_THRESHOLD fields it is a single
+    regex; past that a regex alternation slows down with every field,
+    so a KeySetRedactor, which redacts the same way, is used instead.
+
+    Args:
+        fields: Tuple of fields to obfuscate.
+        redaction: String used to replace field values.
+        separator: Separator used between fields in the log line.
+
+    Returns:
+        A callable taking a log line and returning it obfuscated
+    """
+    if len(fields) > KEYSET_THRESHOLD and all(
+            field and not any(char in field for char in ';=' + separator)
+            and '=' not in separator
+            for field in fields):
+        return KeySetRedactor(fields, redaction, separator)
+    return compile_pattern_redactor(fields, redaction, separator)
+
+
 def filter_datum(
         fields: List[str],
         redaction: str,
@@ -33,12 +198,148 @@ def filter_datum(
     Returns:
         A new log line with specified fields obfuscated
     """
-    pattern = '|'.join([f'{field}=[^;{separator}]*' for field in fields])
-    return re.sub(
-            pattern,
-            lambda match: f"{match.group().split('=')[0]}={redaction}",
-            message
-            )
+    return compile_redactor(tuple(fields), redaction, separator)(message)
+
+
+@functools.lru_cache(maxsize=REDACTOR_CACHE_SIZE)
+def _keyed_columns(fields: frozenset) -> Dict[str, bool]:
+    """
+    Returns the memo of redact_row() telling, per column name, whether
+    it ends with a field name, as the regex engine matches `username=`
+    for `name=`.
+    """
+    return {}
+
+
+def redact_row(
+        row: Mapping[str, Any],
+        fields: Collection[str],
+        redaction: str = "***"
+        ) -> Dict[str, Any]:
+    """
+    Obfuscates specified fields of a row by key lookup
+
+    Masks the row before it is turned into a log line, in
+    O(number of columns) and without a regex scan when no value holds a
+    `=` or `;`. Joined with format_row(), the result is byte-identical
+    to filter_datum() on the joined row with `;` as separator: a column
+    whose name ends with a field name is masked up to the first `;` of
+    its value, and the compiled engine runs over any other value text
+    holding a `=`. Column names must not contain `;` or `=`.
+
+    Args:
+        row: Mapping of column names to values.
+        fields: Fields to obfuscate, ideally a frozenset.
+        redaction: String used to replace field values.
+
+    Returns:
+        A new row with specified fields obfuscated
+    """
+    if not isinstance(fields, frozenset):
+        fields = frozenset(fields)
+    keyed_columns = _keyed_columns(fields)
+    if not keyed_columns.keys() >= row.keys():
+        if len(keyed_columns) >= KeySetRedactor.KEY_CACHE_SIZE:
+            keyed_columns.clear()
+        for key in row:
+            keyed_columns[key] = any(key.endswith(field) for field in fields)
+    texts = "\0".join(map(format, row.values()))
+    if '=' not in texts and ';' not in texts:
+        return {key: redaction if keyed_columns[key] else value
+                for key, value in row.items()}
+
+    def engine(text: str) -> str:
+        return compile_redactor(tuple(sorted(fields)), redaction, ';')(text)
+
+    redacted = {}
+    for key, value in row.items():
+        text = format(value)
+        if keyed_columns[key]:
+            cut = text.find(';')
+            tail = text[cut:] if cut >= 0 else ''
+            value = redaction + (engine(tail) if '=' in tail else tail)
+        elif '=' in text:
+            value = engine(text)
+        redacted[key] = value
+    return redacted
+
+
+def format_row(row: Mapping[str, Any]) -> str:
+    """
+    Builds the log message of a users row.
+
+    Args:
+        row: Mapping of column names to values.
+
+    Returns:
+        The row as a `key=value; ...` string.
+    """
+    return "; ".join(f"{key}={value}" for key, value in row.items())
+
+
+class RedactionCache:
+    """ Bounded LRU of redacted messages """
+
+    ENTRY_OVERHEAD = 120
+
+    def __init__(self, max_bytes: int):
+        """
+        Initialize RedactionCache.
+
+        Args:
+            max_bytes: Memory cap of the cached messages. An entry costs
+                the size of the message and of its redacted form, plus
+                ENTRY_OVERHEAD for the bookkeeping.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def redact(self, engine: Callable[[str], str], message: str) -> str:
+        """
+        Returns the redacted message, running engine only on a miss.
+
+        Entries are keyed by the engine, which stands for the field set,
+        and the message.
+
+        Args:
+            engine: A redactor returned by compile_redactor().
+            message: Original log line.
+
+        Returns:
+            The log line with specified fields obfuscated
+        """
+        key = (engine, message)
+        with self._lock:
+            redacted = self._entries.get(key)
+            if redacted is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return redacted
+            self.misses += 1
+
+        redacted = engine(message)
+        cost = self._cost(message, redacted)
+        if cost > self.max_bytes:
+            return redacted
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = redacted
+                self.size += cost
+                while self.size > self.max_bytes:
+                    (_, old), old_redacted = self._entries.popitem(last=False)
+                    self.size -= self._cost(old, old_redacted)
+        return redacted
+
+    def _cost(self, message: str, redacted: str) -> int:
+        """
+        Returns the bytes accounted for one entry.
+        """
+        return sys.getsizeof(message) + sys.getsizeof(redacted) + \
+            self.ENTRY_OVERHEAD
 
 
 """
@@ -53,32 +354,338 @@ class RedactingFormatter(logging.Formatter):
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
+    def __init__(self, fields: List[str], cache: RedactionCache = None):
         """
         Initialize RedactingFormatter with fields for redaction.
 
         Args:
             fields: List of fields that should be redacted in log messages.
+            cache: Optional cache of redacted messages, so repeated
+                messages skip the redaction pass.
         """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.cache = cache
+        self._field_set = frozenset(fields)
+        self._redact = compile_redactor(
+                tuple(fields), self.REDACTION, self.SEPARATOR
+                )
+
+    def redact(self, record: logging.LogRecord) -> str:
+        """
+        Returns the redacted message of a record.
+
+        The result is memoized on the record per redaction engine, so
+        several handlers sharing a record only redact it once. A record
+        whose msg is a row dict is masked with redact_row() before the
+        message string is built.
+
+        Args:
+            record: LogRecord instance.
+
+        Returns:
+            The rendered message with specified fields redacted.
+        """
+        cache = record.__dict__.setdefault("_redacted", {})
+        message = cache.get(self._redact)
+        if message is None:
+            if isinstance(record.msg, dict) and not record.args:
+                message = format_row(redact_row(
+                    record.msg, self._field_set, self.REDACTION
+                    ))
+            elif self.cache is not None:
+                message = self.cache.redact(self._redact, record.getMessage())
+            else:
+                message = self._redact(record.getMessage())
+            cache[self._redact] = message
+        return message
 
     def format(self, record: logging.LogRecord) -> str:
         """
         Format the log record by redacting specified fields.
 
+        The record itself is left untouched, so later handlers still see
+        the original message.
+
         Args:
             record: LogRecord instance.
 
         Returns:
             The formatted log record with specified fields redacted.
         """
-        record.msg = filter_datum(
-                self.fields, self.REDACTION,
-                record.getMessage(),
-                self.SEPARATOR
-                )
-        return super(RedactingFormatter, self).format(record)
+        values = dict(record.__dict__, message=self.redact(record))
+        if self.usesTime():
+            values["asctime"] = self.formatTime(record, self.datefmt)
+        s = self._fmt % values
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            s = "{}\n{}".format(s, record.exc_text)
+        if record.stack_info:
+            s = "{}\n{}".format(s, self.formatStack(record.stack_info))
+        return s
+
+
+"""
+Module for a non-blocking, queue-based logging pipeline.
+"""
+
+
+class BoundedQueueHandler(QueueHandler):
+    """ QueueHandler over a bounded queue with an overflow policy """
+
+    OVERFLOW_POLICIES = ("block", "drop_oldest", "sample")
+
+    def __init__(
+            self,
+            queue: Queue,
+            overflow: str = "block",
+            sample_every: int = 10
+            ):
+        """
+        Initialize BoundedQueueHandler.
+
+        Args:
+            queue: Bounded queue drained by a QueueListener.
+            overflow: What to do once the queue fills up: `block` waits
+                for room, `drop_oldest` evicts the oldest queued record
+                and `sample` keeps one record in `sample_every` once the
+                queue is half full and drops the rest.
+            sample_every: Sampling ratio of the `sample` policy.
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of {}".format(
+                ", ".join(self.OVERFLOW_POLICIES)
+                ))
+        super(BoundedQueueHandler, self).__init__(queue)
+        self.overflow = overflow
+        self.sample_every = sample_every
+        self.dropped = 0
+        self._sampled = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Prepare a record for queuing.
+
+        Row dicts are queued as they are, so the listener can still
+        redact them by key instead of getting their repr.
+
+        Args:
+            record: The LogRecord to enqueue.
+
+        Returns:
+            The record to put on the queue.
+        """
+        if isinstance(record.msg, dict) and not record.args:
+            return copy.copy(record)
+        return super(BoundedQueueHandler, self).prepare(record)
+
+    @property
+    def depth(self) -> int:
+        """ Number of records waiting for the listener """
+        return self.queue.qsize()
+
+    def enqueue(self, record: logging.LogRecord):
+        """
+        Enqueue a record according to the overflow policy.
+
+        Called by emit() with the handler lock held, so the counters
+        need no further locking.
+
+        Args:
+            record: The prepared LogRecord.
+        """
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        if self.overflow == "sample" and \
+                self.queue.qsize() * 2 >= self.queue.maxsize:
+            self._sampled += 1
+            if self._sampled % self.sample_every:
+                self.dropped += 1
+                return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+            if self.overflow == "drop_oldest":
+                try:
+                    self.queue.get_nowait()
+                    self.queue.task_done()
+                except Empty:
+                    pass
+                self.queue.put_nowait(record)
+
+
+class DrainingQueueListener(QueueListener):
+    """ QueueListener whose stop() waits for room on a full queue """
+
+    def enqueue_sentinel(self):
+        """
+        Puts the stop marker on the queue, blocking until there is room.
+
+        QueueListener uses put_nowait(), which raises queue.Full on a
+        full bounded queue and leaves the thread running and the queued
+        records unwritten. The listener keeps draining meanwhile, so
+        the put always completes and stop() then joins the thread.
+        """
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        """
+        Writes the queued records and stops the thread, if running.
+        """
+        if self._thread is not None:
+            super(DrainingQueueListener, self).stop()
+
+
+"""
+Module for sampling, rate limiting and collapsing repeated log lines.
+"""
+
+
+class SuppressingHandler(logging.Handler):
+    """ Handler wrapper that thins out high-volume, repetitive logs """
+
+    def __init__(
+            self,
+            target: logging.Handler,
+            sample_rate: float = 1.0,
+            rate_limit: float = 0.0,
+            dedup_window: float = 0.0
+            ):
+        """
+        Initialize SuppressingHandler.
+
+        Decisions are taken on the redacted message, so counts are taken
+        over already-masked text.
+
+        Args:
+            target: Handler receiving the records that get through.
+            sample_rate: Share of records kept, 1.0 keeps them all.
+            rate_limit: Records per second allowed per key, 0 for no
+                limit. The key is the `rate_key` extra of a record, or
+                its redacted message.
+            dedup_window: Seconds during which identical messages are
+                collapsed into the first one plus a `(repeated N times)`
+                line, 0 to disable.
+        """
+        super(SuppressingHandler, self).__init__()
+        self.target = target
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self.dedup_window = dedup_window
+        self.suppressed = {"sampled": 0, "rate_limited": 0, "duplicates": 0}
+        self._buckets: Dict[str, List[float]] = {}
+        self._repeats: Dict[str, list] = {}
+        self._next_purge = 0.0
+
+    def _redact(self, record: logging.LogRecord) -> str:
+        """
+        Returns the message of a record as the target will write it.
+        """
+        formatter = self.target.formatter
+        if isinstance(formatter, RedactingFormatter):
+            return formatter.redact(record)
+        return record.getMessage()
+
+    def _emit_repeats(self, message: str, entry: list):
+        """
+        Writes the repeat count of a collapsed message.
+
+        Args:
+            message: The redacted message.
+            entry: [window start, repeat count, first record].
+        """
+        summary = copy.copy(entry[2])
+        summary.msg = "{} (repeated {} times)".format(message, entry[1])
+        summary.args = None
+        summary.exc_info = summary.exc_text = summary.stack_info = None
+        summary._redacted = dict.fromkeys(
+            getattr(entry[2], "_redacted", ()), summary.msg)
+        self.target.handle(summary)
+
+    def _purge(self, now: float):
+        """
+        Closes the dedup windows that ended before now.
+        """
+        for message, entry in list(self._repeats.items()):
+            if now - entry[0] >= self.dedup_window:
+                del self._repeats[message]
+                if entry[1]:
+                    self._emit_repeats(message, entry)
+        self._next_purge = now + self.dedup_window
+
+    def _allowed(self, key: str, now: float) -> bool:
+        """
+        Takes a token from the bucket of key, if there is one left.
+
+        A bucket holds at least one token, so limits below one record
+        per second still let one through every 1 / rate_limit seconds.
+        """
+        capacity = max(1.0, self.rate_limit)
+        bucket = self._buckets.get(key)
+        if bucket is None and len(self._buckets) >= 1024:
+            # A bucket idle long enough to refill is full, like a new one
+            self._buckets = {k: b for k, b in self._buckets.items()
+                             if (now - b[1]) * self.rate_limit < capacity}
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+        tokens = min(capacity,
+                     bucket[0] + (now - bucket[1]) * self.rate_limit)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        """
+        Forwards the record to the target unless it is suppressed.
+
+        Args:
+            record: LogRecord instance.
+        """
+        message = self._redact(record)
+        now = record.created
+        if self.dedup_window > 0:
+            if now >= self._next_purge:
+                self._purge(now)
+            entry = self._repeats.get(message)
+            if entry is not None:
+                entry[1] += 1
+                self.suppressed["duplicates"] += 1
+                return
+        if self.rate_limit > 0 and \
+                not self._allowed(getattr(record, "rate_key", message), now):
+            self.suppressed["rate_limited"] += 1
+            return
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            self.suppressed["sampled"] += 1
+            return
+        if self.dedup_window > 0:
+            # Only a written message opens a dedup window
+            self._repeats[message] = [now, 0, record]
+        self.target.handle(record)
+
+    def flush(self):
+        """
+        Writes pending repeat counts and flushes the target.
+        """
+        self.acquire()
+        try:
+            self._purge(float("inf"))
+            self.target.flush()
+        finally:
+            self.release()
+
+    def close(self):
+        """
+        Writes pending repeat counts before closing.
+        """
+        self.flush()
+        super(SuppressingHandler, self).close()
 
 
 """
@@ -86,53 +693,205 @@ Module to create a logger with sensitive data redaction.
 """
 
 
-def get_logger() -> logging.Logger:
+_listener: QueueListener = None
+_redaction_cache: RedactionCache = None
+
+
+def get_logger(
+        queue_size: int = None,
+        overflow: str = None,
+        sample_rate: float = None,
+        rate_limit: float = None,
+        dedup_window: float = None,
+        cache_bytes: int = None
+        ) -> logging.Logger:
     """
     Creates a logger configured to redact PII in log messages.
 
+    The logger is configured once; later calls return it unchanged.
+
+    Args:
+        queue_size: When positive, records are put on a queue of this
+            size and redacted and written by a background QueueListener.
+            Defaults to PERSONAL_DATA_LOG_QUEUE_SIZE (0, synchronous).
+        overflow: Overflow policy of the queue, see BoundedQueueHandler.
+            Defaults to PERSONAL_DATA_LOG_OVERFLOW (`block`).
+        sample_rate: Share of records kept, see SuppressingHandler.
+            Defaults to PERSONAL_DATA_LOG_SAMPLE_RATE (1.0).
+        rate_limit: Records per second per key. Defaults to
+            PERSONAL_DATA_LOG_RATE_LIMIT (0, unlimited).
+        dedup_window: Seconds over which repeats are collapsed. Defaults
+            to PERSONAL_DATA_LOG_DEDUP_WINDOW (0, disabled).
+        cache_bytes: Memory cap of a RedactionCache of repeated messages.
+            Defaults to PERSONAL_DATA_REDACTION_CACHE_BYTES (0, no cache).
+
     Returns:
         logging.Logger: A logger configured with RedactingFormatter.
     """
+    global _listener, _redaction_cache
+
     # Initialize the logger
     logger = logging.getLogger("user_data")
+    if logger.handlers:
+        return logger
     logger.setLevel(logging.INFO)
     logger.propagate = False  # Prevent propagation to other loggers
 
+    if queue_size is None:
+        queue_size = int(os.getenv("PERSONAL_DATA_LOG_QUEUE_SIZE", "0"))
+    if overflow is None:
+        overflow = os.getenv("PERSONAL_DATA_LOG_OVERFLOW", "block")
+    if sample_rate is None:
+        sample_rate = float(os.getenv("PERSONAL_DATA_LOG_SAMPLE_RATE", "1"))
+    if rate_limit is None:
+        rate_limit = float(os.getenv("PERSONAL_DATA_LOG_RATE_LIMIT", "0"))
+    if dedup_window is None:
+        dedup_window = float(os.getenv("PERSONAL_DATA_LOG_DEDUP_WINDOW", "0"))
+    if cache_bytes is None:
+        cache_bytes = int(
+            os.getenv("PERSONAL_DATA_REDACTION_CACHE_BYTES", "0"))
+    if cache_bytes > 0:
+        _redaction_cache = RedactionCache(cache_bytes)
+
     # Create a StreamHandler with RedactingFormatter
     stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(RedactingFormatter(fields=PII_FIELDS))
+    stream_handler.setFormatter(
+        RedactingFormatter(fields=PII_FIELDS, cache=_redaction_cache))
+    handler: logging.Handler = stream_handler
+    if sample_rate < 1 or rate_limit > 0 or dedup_window > 0:
+        handler = SuppressingHandler(
+            stream_handler, sample_rate, rate_limit, dedup_window)
+
+    if queue_size <= 0:
+        # Attach the handler to the logger
+        logger.addHandler(handler)
+        return logger
 
-    # Attach the handler to the logger
-    logger.addHandler(stream_handler)
+    # Redact and write on a background thread
+    queue_handler = BoundedQueueHandler(Queue(queue_size), overflow)
+    _listener = DrainingQueueListener(queue_handler.queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logger.addHandler(queue_handler)
 
     return logger
 
 
+def get_logger_stats() -> Dict[str, int]:
+    """
+    Reports the backpressure of the `user_data` logger.
+
+    Returns:
+        The current queue depth, the number of records dropped by the
+        queue or suppressed by sampling, rate limiting and dedup, and
+        the hits and misses of the redaction cache; 0 for the stages
+        that are not enabled.
+    """
+    stats = {"queue_depth": 0, "dropped": 0, "suppressed": 0,
+             "cache_hits": 0, "cache_misses": 0}
+    if _redaction_cache is not None:
+        stats["cache_hits"] = _redaction_cache.hits
+        stats["cache_misses"] = _redaction_cache.misses
+    handlers = logging.getLogger("user_data").handlers
+    if _listener is not None:
+        handlers = handlers + list(_listener.handlers)
+    for handler in handlers:
+        if isinstance(handler, BoundedQueueHandler):
+            stats["queue_depth"] = handler.depth
+            stats["dropped"] = handler.dropped
+        elif isinstance(handler, SuppressingHandler):
+            stats["suppressed"] = sum(handler.suppressed.values())
+    return stats
+
+
 """
 Module to connect to a secure database.
 """
 
 
+_pool: MySQLConnectionPool = None
+_connected_at: Dict[int, Tuple[Any, float]] = {}
+
+
+def _db_config() -> Dict[str, str]:
+    """
+    Reads the database credentials from environment variables.
+
+    Returns:
+        Keyword arguments for a MySQL connection.
+    """
+    return {
+        "user": os.getenv("PERSONAL_DATA_DB_USERNAME", "root"),
+        "password": os.getenv("PERSONAL_DATA_DB_PASSWORD", ""),
+        "host": os.getenv("PERSONAL_DATA_DB_HOST", "localhost"),
+        "database": os.getenv("PERSONAL_DATA_DB_NAME"),
+    }
+
+
+def get_db_pool(pool_size: int) -> MySQLConnectionPool:
+    """
+    Returns the process-wide connection pool, creating it on first use.
+
+    The pool opens all its connections up front; each is recorded in
+    _connected_at with its server connection id and opening time.
+
+    Args:
+        pool_size: Number of connections kept open by the pool.
+
+    Returns:
+        MySQLConnectionPool: The shared pool.
+    """
+    global _pool
+
+    if _pool is None:
+        opened = time.monotonic()
+        _pool = MySQLConnectionPool(
+            pool_name="personal_data",
+            pool_size=pool_size,
+            **_db_config()
+        )
+        for raw in list(_pool._cnx_queue.queue):
+            _connected_at[id(raw)] = (raw.connection_id, opened)
+    return _pool
+
+
 def get_db() -> MySQLConnection:
     """
     Connects to the MySQL database using
     credentials from environment variables.
 
+    When PERSONAL_DATA_DB_POOL_SIZE is positive the connection is checked
+    out of a shared pool instead, and close() hands it back. When all
+    pooled connections are checked out, a direct connection is opened as
+    without a pool. The pool pings a connection on checkout and
+    reconnects it if it went away, which shows as a new server connection
+    id; connections opened more than PERSONAL_DATA_DB_POOL_RECYCLE
+    seconds ago are reconnected as well.
+
     Returns:
         MySQLConnection: A connection object to the database.
     """
-    username = os.getenv("PERSONAL_DATA_DB_USERNAME", "root")
-    password = os.getenv("PERSONAL_DATA_DB_PASSWORD", "")
-    host = os.getenv("PERSONAL_DATA_DB_HOST", "localhost")
-    db = os.getenv("PERSONAL_DATA_DB_NAME")
+    pool_size = int(os.getenv("PERSONAL_DATA_DB_POOL_SIZE", "0"))
+    if pool_size <= 0:
+        # Connect to the MySQL database
+        return MySQLConnection(**_db_config())
 
-    # Connect to the MySQL database
-    connection = MySQLConnection(
-        user=username,
-        password=password,
-        host=host,
-        database=db
-    )
+    try:
+        connection = get_db_pool(pool_size).get_connection()
+    except PoolError:
+        # Pool exhausted: get_db() never failed for lack of connections
+        return MySQLConnection(**_db_config())
+    recycle = float(os.getenv("PERSONAL_DATA_DB_POOL_RECYCLE", "3600"))
+    raw = connection._cnx
+    now = time.monotonic()
+    connection_id, opened = _connected_at.get(id(raw), (None, now))
+    if connection_id != raw.connection_id:
+        # Reconnected by the pool on checkout
+        opened = now
+    if now - opened > recycle > 0:
+        raw.reconnect()
+        opened = time.monotonic()
+    _connected_at[id(raw)] = (raw.connection_id, opened)
 
     return connection
 
@@ -146,28 +905,258 @@ user data with sensitive fields redacted.
 PII_FIELDS = ["name", "email", "phone", "ssn", "password"]
 
 
-def main():
+def stream_rows(cursor: MySQLCursor, batch_size: int) -> Iterator[dict]:
+    """
+    Yields the rows of an executed query `batch_size` at a time.
+
+    Args:
+        cursor: An unbuffered cursor on which a query was executed.
+        batch_size: Number of rows fetched per round trip.
+
+    Yields:
+        Each row of the result set.
+    """
+    rows = cursor.fetchmany(batch_size)
+    while rows:
+        yield from rows
+        rows = cursor.fetchmany(batch_size)
+
+
+def report_throughput(count: int, start: float):
+    """
+    Prints the export rate on stderr.
+
+    Args:
+        count: Number of exported rows.
+        start: time.perf_counter() value when the export started.
+    """
+    elapsed = time.perf_counter() - start
+    print("exported {} rows in {:.2f}s ({:,.0f} rows/s)".format(
+        count, elapsed, count / elapsed if elapsed else 0
+        ), file=sys.stderr)
+
+
+def _init_export_worker():
+    """
+    Drops any connection pool inherited from the parent process.
+    """
+    global _pool
+
+    _pool = None
+    _connected_at.clear()
+
+
+def _quote(column: str) -> str:
+    """
+    Quotes a column name for use in a query.
+    """
+    return "`{}`".format(column.replace("`", "``"))
+
+
+def export_key(key: str = None) -> Optional[str]:
+    """
+    Picks the column a parallel export of the users table is split on.
+
+    Args:
+        key: Column to split on. Defaults to PERSONAL_DATA_EXPORT_KEY,
+            or else the first column of the primary key.
+
+    Returns:
+        The column, or None when the table has no such column or no
+        primary key.
+    """
+    if key is None:
+        key = os.getenv("PERSONAL_DATA_EXPORT_KEY")
+    db_connection: MySQLConnection = get_db()
+    cursor = db_connection.cursor(dictionary=True)
+    try:
+        if key is None:
+            cursor.execute(
+                "SHOW KEYS FROM users WHERE Key_name = 'PRIMARY';")
+            columns = [row["Column_name"] for row in cursor.fetchall()
+                       if row["Seq_in_index"] == 1]
+        else:
+            cursor.execute("SHOW COLUMNS FROM users;")
+            columns = [row["Field"] for row in cursor.fetchall()
+                       if row["Field"] == key]
+    finally:
+        cursor.close()
+        db_connection.close()
+    return columns[0] if columns else None
+
+
+def _key_ranges(key: str, chunk_size: int) -> Iterator[Tuple[str, tuple]]:
+    """
+    Splits the users table into ranges of about `chunk_size` rows.
+
+    Bounds are key values read from the table with index seeks, so keys
+    need not be dense integers nor unique: a range always ends before a
+    new key value. Rows with a NULL key come first, as in ORDER BY.
+
+    Args:
+        key: Column to split on, preferably indexed.
+        chunk_size: Number of rows per range.
+
+    Yields:
+        (condition, parameters) of a WHERE clause per range, in key order.
+    """
+    column = _quote(key)
+    db_connection: MySQLConnection = get_db()
+    cursor = db_connection.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM users WHERE {} IS NULL LIMIT 1;"
+                       .format(column))
+        if cursor.fetchall():
+            yield "{} IS NULL".format(column), ()
+        cursor.execute("SELECT MIN({0}) FROM users;".format(column))
+        low = cursor.fetchone()[0]
+        while low is not None:
+            cursor.execute(
+                "SELECT {0} FROM users WHERE {0} >= %s ORDER BY {0} "
+                "LIMIT 1 OFFSET %s;".format(column), (low, chunk_size))
+            rows = cursor.fetchall()
+            high = rows[0][0] if rows else None
+            if high is not None and high == low:
+                # More than chunk_size rows share this key
+                cursor.execute("SELECT MIN({0}) FROM users WHERE {0} > %s;"
+                               .format(column), (low,))
+                high = cursor.fetchone()[0]
+            if high is None:
+                yield "{} >= %s".format(column), (low,)
+                return
+            yield "{0} >= %s AND {0} < %s".format(column), (low, high)
+            low = high
+    finally:
+        cursor.close()
+        db_connection.close()
+
+
+def _export_chunk(key: str, condition: str, params: tuple) -> List[str]:
+    """
+    Fetches and redacts one key range of the users table.
+
+    Runs in a worker process with its own database connection.
+
+    Args:
+        key: Column the export is split on.
+        condition: WHERE clause of the range, see _key_ranges().
+        params: Parameters of condition.
+
+    Returns:
+        The redacted log messages of the range, in key order.
+    """
+    fields = frozenset(PII_FIELDS)
+    db_connection: MySQLConnection = get_db()
+    cursor = db_connection.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute("SELECT * FROM users WHERE {} ORDER BY {};".format(
+            condition, _quote(key)), params)
+        return [format_row(redact_row(
+            row, fields, RedactingFormatter.REDACTION)) for row in cursor]
+    finally:
+        cursor.close()
+        db_connection.close()
+
+
+def export_parallel(workers: int, chunk_size: int, key: str) -> int:
+    """
+    Exports the users table with its key ranges redacted in parallel.
+
+    The table is split into ranges of about `chunk_size` rows on the
+    column `key`, see _key_ranges(), each fetched with a range scan and
+    redacted by a process pool. At most 2 * workers ranges are in
+    flight and results are logged back in key order through
+    get_logger(), so they go through the same queue, sampling and dedup
+    as a serial export; only the redaction is not done again.
+
+    Args:
+        workers: Number of worker processes.
+        chunk_size: Number of rows per range.
+        key: Column to split on, see export_key().
+
+    Returns:
+        The number of exported rows.
+    """
+    logger = get_logger()
+    engine = compile_redactor(tuple(PII_FIELDS),
+                              RedactingFormatter.REDACTION,
+                              RedactingFormatter.SEPARATOR)
+    count = 0
+
+    def log(messages: List[str]):
+        nonlocal count
+        for message in messages:
+            # Already redacted: RedactingFormatter.redact() reuses it
+            logger.info(message, extra={"_redacted": {engine: message}})
+        count += len(messages)
+
+    pending = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_export_worker) \
+            as executor:
+        for condition, params in _key_ranges(key, chunk_size):
+            if len(pending) >= 2 * workers:
+                log(pending.popleft().result())
+            pending.append(executor.submit(
+                _export_chunk, key, condition, params))
+        while pending:
+            log(pending.popleft().result())
+    return count
+
+
+def main(
+        batch_size: int = None,
+        workers: int = None,
+        chunk_size: int = None
+        ):
     """
     Main function to retrieve and log user data
     with sensitive information redacted.
+
+    Args:
+        batch_size: When positive, rows are streamed from an unbuffered
+            cursor in batches of this size instead of being fetched all
+            at once. Defaults to PERSONAL_DATA_BATCH_SIZE.
+        workers: When above 1, the table is exported by this many
+            processes, see export_parallel(), as long as export_key()
+            finds a column to split it on; otherwise it is exported by
+            a single cursor. Defaults to PERSONAL_DATA_EXPORT_WORKERS.
+        chunk_size: Rows per range of a parallel export. Defaults to
+            PERSONAL_DATA_CHUNK_SIZE (10000).
     """
+    if batch_size is None:
+        batch_size = int(os.getenv("PERSONAL_DATA_BATCH_SIZE", "0"))
+    if workers is None:
+        workers = int(os.getenv("PERSONAL_DATA_EXPORT_WORKERS", "1"))
+    if chunk_size is None:
+        chunk_size = int(os.getenv("PERSONAL_DATA_CHUNK_SIZE", "10000"))
+
+    key = export_key() if workers > 1 else None
+    if key is not None:
+        start = time.perf_counter()
+        report_throughput(export_parallel(workers, chunk_size, key), start)
+        return
+
     # Get a logger configured with RedactingFormatter
     logger = get_logger()
 
     # Connect to the database
     db_connection: MySQLConnection = get_db()
-    cursor = db_connection.cursor(dictionary=True)
+    cursor = db_connection.cursor(dictionary=True, buffered=False)
 
     try:
         cursor.execute("SELECT * FROM users;")
-        rows = cursor.fetchall()
-
-        # Log each row with redacted PII
-        for row in rows:
-            message = "; ".join(
-                    f"{key}={value}" for key, value in row.items()
-                    )
-            logger.info(message)
+        if batch_size <= 0:
+            # Log each row with redacted PII
+            for row in cursor.fetchall():
+                logger.info(row)
+            return
+
+        start = time.perf_counter()
+        count = 0
+        for row in stream_rows(cursor, batch_size):
+            logger.info(row)
+            count += 1
+        report_throughput(count, start)
 
     finally:
         cursor.close()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Bulk redaction of existing log files.
+
+Usage: ./redact_logs.py INPUT OUTPUT [--workers N] [--chunk-size MB]
+
+The input is memory-mapped and cut into chunks on line boundaries. Each
+chunk is redacted as bytes with the PII_FIELDS rules of filtered_logger,
+in parallel, and written to the output in order, so memory use depends
+on the chunk size and worker count, not on the file size.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, Tuple
+import argparse
+import mmap
+import os
+import re
+import sys
+import time
+
+from filtered_logger import PII_FIELDS
+
+
+_data: mmap.mmap = None
+_redact: Callable[[bytes], bytes] = None
+
+
+def compile_bytes_redactor(
+        fields: Tuple[str, ...],
+        redaction: bytes,
+        separator: bytes
+        ) -> Callable[[bytes], bytes]:
+    """
+    Compiles filter_datum's redaction rules as a bytes pattern.
+
+    Values also stop at a newline so a match never spans two lines.
+
+    Args:
+        fields: Fields to obfuscate.
+        redaction: Bytes used to replace field values.
+        separator: Separator used between fields in the log lines.
+
+    Returns:
+        A callable taking log lines and returning them obfuscated
+    """
+    pattern = re.compile(b'(?<==)(?:' + b'|'.join(
+        b'(?<=' + re.escape(field.encode()) + b'=)' for field in fields
+        ) + b')[^;\n' + re.escape(separator) + b']*')
+    return lambda lines: pattern.sub(redaction.replace(b'\\', b'\\\\'), lines)
+
+
+def line_chunks(data: mmap.mmap, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Cuts data into ranges of about chunk_size bytes ending on a newline.
+
+    Args:
+        data: The mapped file.
+        chunk_size: Target size of a range in bytes.
+
+    Yields:
+        (start, end) offsets of each range.
+    """
+    start, size = 0, len(data)
+    while start < size:
+        end = data.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        yield start, end
+        start = end
+
+
+def _init_worker(path: str, redaction: bytes, separator: bytes):
+    """
+    Maps the input file and compiles the pattern once per worker.
+    """
+    global _data, _redact
+
+    with open(path, 'rb') as f:
+        _data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _redact = compile_bytes_redactor(tuple(PII_FIELDS), redaction, separator)
+
+
+def _redact_range(start: int, end: int) -> bytes:
+    """
+    Redacts one range of the mapped file.
+    """
+    return _redact(_data[start:end])
+
+
+def redact_file(
+        src: str,
+        dst: str,
+        workers: int = None,
+        chunk_size: int = 64 << 20,
+        redaction: bytes = b"***",
+        separator: bytes = b";"
+        ) -> int:
+    """
+    Redacts the log file src into dst.
+
+    Args:
+        src: Path of the log file to redact.
+        dst: Path of the redacted copy.
+        workers: Number of worker processes, one per CPU by default.
+        chunk_size: Bytes redacted per task.
+        redaction: Bytes used to replace field values.
+        separator: Separator used between fields in the log lines.
+
+    Returns:
+        The number of bytes read.
+    """
+    workers = workers or os.cpu_count()
+    with open(src, 'rb') as f, open(dst, 'wb', buffering=chunk_size) as out:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with data:
+            if workers == 1:
+                redact = compile_bytes_redactor(
+                    tuple(PII_FIELDS), redaction, separator)
+                for start, end in line_chunks(data, chunk_size):
+                    out.write(redact(data[start:end]))
+                return len(data)
+
+            pending = deque()
+            with ProcessPoolExecutor(
+                    workers, initializer=_init_worker,
+                    initargs=(src, redaction, separator)
+                    ) as executor:
+                for start, end in line_chunks(data, chunk_size):
+                    if len(pending) >= 2 * workers:
+                        out.write(pending.popleft().result())
+                    pending.append(executor.submit(_redact_range, start, end))
+                while pending:
+                    out.write(pending.popleft().result())
+            return len(data)
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("input", help="log file to redact")
+    parser.add_argument("output", help="where the redacted copy is written")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=64,
+                        help="megabytes redacted per task (default: 64)")
+    parser.add_argument("--separator", default=";",
+                        help="field separator (default: ;)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    size = redact_file(args.input, args.output, args.workers,
+                       args.chunk_size << 20,
+                       separator=args.separator.encode())
+    elapsed = time.perf_counter() - start
+    print("redacted {:,} bytes in {:.2f}s ({:.2f} GB/s)".format(
+        size, elapsed, size / elapsed / 1e9 if elapsed else 0
+        ), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
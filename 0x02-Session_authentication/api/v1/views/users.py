@@ -4,7 +4,7 @@ Module of Users views.
 """
 
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import Response, abort, jsonify, request, stream_with_context
 from models.user import User
 
 
@@ -13,9 +13,16 @@ def view_all_users() -> str:
     """
     GET /api/v1/users
     List all JSON represented User objects
+    The list is streamed as users are read, not built in memory
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    def generate():
+        yield b"["
+        for i, user in enumerate(User.all()):
+            yield (b"," if i else b"") + user.to_json_bytes()
+        yield b"]\n"
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/json")
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+""" Base.search by indexed email against a linear scan,
+from 10^3 up to 10^6 users held in memory
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.user import User
+
+
+def scan(attributes: dict) -> list:
+    """ Base.search as it was before indexes
+    """
+    return [obj for obj in User.storage().data["User"].values()
+            if all(getattr(obj, k) == v for k, v in attributes.items())]
+
+
+def per_lookup(func, emails: list) -> float:
+    """ Mean duration of func over the emails, in microseconds
+    """
+    start = time.perf_counter()
+    for email in emails:
+        func({"email": email})
+    return (time.perf_counter() - start) / len(emails) * 1e6
+
+
+def main(max_users: int = 10 ** 5):
+    """ Print the lookup latency of both paths per dataset size
+    """
+    # Away from any .db_User.json, which search() would reload
+    os.chdir(tempfile.mkdtemp())
+    print("{:>9} {:>14} {:>14}".format("users", "scan", "indexed"))
+    size = 10 ** 3
+    while size <= max_users:
+        storage = User.storage()
+        storage.data["User"] = {}
+        for i in range(size):
+            user = User(email="user{}@example.com".format(i))
+            storage.data["User"][user.id] = user
+        storage.reindex(User)
+        emails = ["user{}@example.com".format(i)
+                  for i in range(0, size, max(1, size // 100))]
+        assert scan({"email": emails[-1]}) == \
+            User.search({"email": emails[-1]})
+        print("{:>9,} {:>12.1f}us {:>12.1f}us".format(
+            size,
+            per_lookup(scan, emails[:10]),
+            per_lookup(User.search, emails)))
+        size *= 10
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
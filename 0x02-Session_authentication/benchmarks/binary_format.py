@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+""" Startup time, peak RSS and first-access get() latency of the
+binary snapshot format against the JSON one
+Each format runs in its own process so peak RSS is measured cleanly
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child(data_format: str, lookups: int):
+    """ Load .db_User.* from the current directory, get lookups random
+    users and print the timings and peak RSS as JSON
+    """
+    os.environ["DB_FORMAT"] = data_format
+    from models.user import User
+    start = time.perf_counter()
+    User.load_from_file()
+    loaded = time.perf_counter() - start
+    ids = random.Random(0).sample(list(User.storage().data["User"]), lookups)
+    start = time.perf_counter()
+    for obj_id in ids:
+        assert User.get(obj_id).id == obj_id
+    lookup = time.perf_counter() - start
+    print(json.dumps({"seconds": loaded, "get_us": lookup / lookups * 1e6,
+                      "peak_kb": resource.getrusage(
+                          resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def main(users: int = 200000, lookups: int = 1000):
+    """ Print startup, lookup and memory figures of both formats
+    """
+    from benchmarks.load_from_file import write_users
+    from convert_db import convert
+    from models.user import User
+
+    project = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_users(os.path.join(tmp, ".db_User.json"), users)
+        os.chdir(tmp)
+        convert(User, "binary")
+        os.chdir(project)
+        print("{:,} users: JSON {:.1f} MB, binary {:.1f} MB".format(
+            users, os.path.getsize(os.path.join(tmp, ".db_User.json")) / 1e6,
+            os.path.getsize(os.path.join(tmp, ".db_User.bin")) / 1e6))
+        for data_format in ("json", "binary"):
+            out = subprocess.run(
+                [sys.executable, "-c",
+                 "import sys; sys.path.insert(0, {!r}); "
+                 "from benchmarks.binary_format import child; "
+                 "child({!r}, {})".format(project, data_format, lookups)],
+                cwd=tmp, check=True, capture_output=True, text=True).stdout
+            result = json.loads(out)
+            print("{:<6} load {:>6.2f}s  get {:>6.1f}us  {:>10,} KB "
+                  "peak RSS".format(data_format, result["seconds"],
+                                    result["get_us"], result["peak_kb"]))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+""" Startup time and peak RSS of User.load_from_file against the
+eager json.load loader it replaced
+Each loader runs in its own process so peak RSS is measured cleanly
+"""
+from datetime import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+def eager_load(cls):
+    """ load_from_file as it was before lazy records
+    """
+    s_class = cls.__name__
+    objects = cls.storage().data[s_class] = {}
+    with open(".db_{}.json".format(s_class), 'r') as f:
+        for obj_id, obj_json in json.load(f).items():
+            objects[obj_id] = cls(**obj_json)
+
+
+def child(loader: str):
+    """ Load .db_User.json from the current directory and print the
+    elapsed time and peak RSS as JSON
+    """
+    from models.user import User
+    start = time.perf_counter()
+    if loader == "eager":
+        eager_load(User)
+    else:
+        User.load_from_file()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_kb": peak}))
+
+
+def write_users(file_path: str, count: int):
+    """ Write a .db_User.json holding count users
+    """
+    now = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+    with open(file_path, 'w') as f:
+        f.write("{")
+        for i in range(count):
+            user_id = str(uuid.uuid4())
+            record = {
+                "id": user_id,
+                "created_at": now,
+                "updated_at": now,
+                "email": "user{}@example.com".format(i),
+                "_password": "0" * 64,
+                "first_name": "First",
+                "last_name": "Last",
+            }
+            f.write("{}{}: {}".format("," if i else "", json.dumps(user_id),
+                                      json.dumps(record)))
+        f.write("}")
+
+
+def main(users: int = 200000):
+    """ Print startup time and peak RSS of both loaders
+    """
+    project = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        write_users(os.path.join(tmp, ".db_User.json"), users)
+        print("{:,} users, {:.1f} MB file".format(
+            users, os.path.getsize(os.path.join(tmp, ".db_User.json")) / 1e6))
+        for loader in ("eager", "lazy"):
+            out = subprocess.run(
+                [sys.executable, "-c",
+                 "import sys; sys.path.insert(0, {!r}); "
+                 "from benchmarks.load_from_file import child; "
+                 "child({!r})".format(project, loader)],
+                cwd=tmp, check=True, capture_output=True, text=True).stdout
+            result = json.loads(out)
+            print("{:<6} {:>8.2f}s {:>10,} KB peak RSS".format(
+                loader, result["seconds"], result["peak_kb"]))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
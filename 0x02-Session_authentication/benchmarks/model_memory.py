@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+""" Memory held per User and UserSession object, slotted models against
+the __dict__-based models they replaced
+Objects are built from JSON records as load_from_file does, sessions
+spread over 1,000 users
+"""
+from datetime import datetime
+import json
+import sys
+import tracemalloc
+import uuid
+
+from models.base import TIMESTAMP_FORMAT
+from models.user import User
+from models.user_session import UserSession
+
+
+class LegacyBase():
+    """ Base as it was before __slots__
+    """
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a LegacyBase instance
+        """
+        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.created_at = datetime.strptime(kwargs.get('created_at'),
+                                            TIMESTAMP_FORMAT)
+        self.updated_at = datetime.strptime(kwargs.get('updated_at'),
+                                            TIMESTAMP_FORMAT)
+
+
+class LegacyUser(LegacyBase):
+    """ User as it was before __slots__
+    """
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a LegacyUser instance
+        """
+        super().__init__(*args, **kwargs)
+        self.email = kwargs.get('email')
+        self._password = kwargs.get('_password')
+        self.first_name = kwargs.get('first_name')
+        self.last_name = kwargs.get('last_name')
+
+
+class LegacyUserSession(LegacyBase):
+    """ UserSession as it was before __slots__
+    """
+
+    def __init__(self, *args: list, **kwargs: dict):
+        """ Initialize a LegacyUserSession instance
+        """
+        super().__init__(*args, **kwargs)
+        self.user_id = kwargs.get('user_id')
+        self.session_id = kwargs.get('session_id')
+
+
+def records(kind: str, count: int) -> list:
+    """ JSON texts of count users or sessions
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    user_ids = [str(uuid.uuid4()) for _ in range(1000)]
+    result = []
+    for i in range(count):
+        record = {"id": str(uuid.uuid4()), "created_at": now,
+                  "updated_at": now}
+        if kind == "user":
+            record.update({"email": "user{}@example.com".format(i),
+                           "_password": "0" * 64,
+                           "first_name": "First", "last_name": "Last"})
+        else:
+            record.update({"user_id": user_ids[i % len(user_ids)],
+                           "session_id": str(uuid.uuid4())})
+        result.append(json.dumps(record))
+    return result
+
+
+def bytes_per_object(cls, raws: list) -> float:
+    """ Memory retained by objects of cls built from raws, per object
+    """
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    objs = [cls(**json.loads(raw)) for raw in raws]
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del objs
+    return size / len(raws)
+
+
+def main(count: int = 100000):
+    """ Print the bytes per object of both representations
+    """
+    print("{:>12} {:>10} {:>10}".format("model", "legacy", "slots"))
+    for name, legacy, cls in (("User", LegacyUser, User),
+                              ("UserSession", LegacyUserSession,
+                               UserSession)):
+        raws = records("user" if cls is User else "session", count)
+        assert legacy(**json.loads(raws[0])).__dict__["id"] == \
+            cls(**json.loads(raws[0])).to_json(True)["id"]
+        print("{:>12} {:>8.0f} B {:>8.0f} B".format(
+            name, bytes_per_object(legacy, raws),
+            bytes_per_object(cls, raws)))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+""" save() latency of the file backend against the number of users,
+with the data split into 1, 16 and 64 shards
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+def main(saves: int = 50):
+    """ Print the mean save() latency for each size and shard count
+    """
+    from benchmarks.load_from_file import write_users
+    from models.user import User
+
+    project = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        print("{:>8}  {:>10}  {:>10}  {:>10}".format(
+            "users", "1 shard", "16 shards", "64 shards"))
+        for users in (1000, 10000, 100000):
+            write_users(".db_User.json", users)
+            row = []
+            for shards in (1, 16, 64):
+                os.environ["DB_SHARDS"] = str(shards)
+                # Loading with another DB_SHARDS reshards the data
+                User.load_from_file()
+                ids = random.Random(0).sample(
+                    list(User.storage().data["User"]), saves)
+                start = time.perf_counter()
+                for obj_id in ids:
+                    user = User.get(obj_id)
+                    user.first_name = "Saved"
+                    user.save()
+                row.append((time.perf_counter() - start) / saves * 1e3)
+            os.environ["DB_SHARDS"] = "1"
+            User.load_from_file()
+            print("{:>8,}  {:>8.2f}ms  {:>8.2f}ms  {:>8.2f}ms".format(
+                users, *row))
+        os.chdir(project)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+""" Serialization cost of GET /api/v1/users: the __dict__ walk to_json()
+did before, against the cached field-plan output and to_json_bytes()
+"""
+from datetime import datetime
+import json
+import sys
+import time
+
+from benchmarks.model_memory import LegacyUser
+from models.base import TIMESTAMP_FORMAT, orjson
+from models.user import User
+
+
+def legacy_to_json(obj) -> dict:
+    """ to_json() as it was before the field plan
+    """
+    result = {}
+    for key, value in obj.__dict__.items():
+        if key[0] == '_':
+            continue
+        if type(value) is datetime:
+            result[key] = value.strftime(TIMESTAMP_FORMAT)
+        else:
+            result[key] = value
+    return result
+
+
+def per_user(func, objs: list) -> float:
+    """ Mean duration of func over objs, in microseconds
+    """
+    start = time.perf_counter()
+    func(objs)
+    return (time.perf_counter() - start) / len(objs) * 1e6
+
+
+def main(count: int = 100000):
+    """ Print the serialization time per user of each path
+    """
+    now = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+    records = [{"id": str(i), "created_at": now, "updated_at": now,
+                "email": "user{}@example.com".format(i),
+                "_password": "0" * 64, "first_name": "First",
+                "last_name": "Last"} for i in range(count)]
+    legacy = [LegacyUser(**record) for record in records]
+    users = [User(**record) for record in records]
+    assert [legacy_to_json(obj) for obj in legacy[:100]] == \
+        [obj.to_json() for obj in users[:100]]
+
+    def dumps(obj_jsons):
+        return json.dumps(obj_jsons, sort_keys=True, separators=(",", ":"))
+
+    print("orjson: {}".format("yes" if orjson else "not installed"))
+    print("legacy to_json()      {:>6.2f}us".format(per_user(
+        lambda objs: [legacy_to_json(obj) for obj in objs], legacy)))
+    print("to_json() first call  {:>6.2f}us".format(per_user(
+        lambda objs: [obj.to_json() for obj in objs], users)))
+    print("to_json() cached      {:>6.2f}us".format(per_user(
+        lambda objs: [obj.to_json() for obj in objs], users)))
+    print("legacy response       {:>6.2f}us".format(per_user(
+        lambda objs: dumps([legacy_to_json(obj) for obj in objs]), legacy)))
+    print("to_json_bytes() first {:>6.2f}us".format(per_user(
+        lambda objs: b",".join(obj.to_json_bytes() for obj in objs),
+        [User(**record) for record in records])))
+    print("to_json_bytes() cached{:>6.2f}us".format(per_user(
+        lambda objs: b",".join(obj.to_json_bytes() for obj in objs),
+        users)))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
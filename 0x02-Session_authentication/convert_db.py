@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Conversion of Base data files between the JSON and binary formats.
+
+Usage: ./convert_db.py CLASS {binary,json}
+
+Converts .db_CLASS.json to .db_CLASS.bin, or back, in the current
+directory. Run it with the API stopped; set DB_FORMAT to the new format
+before starting the API again.
+"""
+from os import path
+import argparse
+import json
+import os
+import sys
+
+from models.engine.file_storage import manifest_path
+from models.engine.formats import dump_binary, dump_records, \
+    encode_record, iter_json_object, map_file, read_binary_index, \
+    read_record
+from models.user import User
+from models.user_session import UserSession
+
+
+MODELS = {cls.__name__: cls for cls in (User, UserSession)}
+
+
+def convert(cls, to: str) -> int:
+    """
+    Writes the data file of cls in the format to ("binary" or "json")
+    from the one in the other format.
+
+    Returns:
+        The number of records converted.
+    """
+    s_class = cls.__name__
+    json_path = ".db_{}.json".format(s_class)
+    binary_path = ".db_{}.bin".format(s_class)
+    if path.exists(".db_{}.journal".format(s_class)):
+        raise ValueError("{} has a journal: start the API without "
+                         "DB_JOURNAL once to fold it".format(s_class))
+    if path.exists(manifest_path(s_class)):
+        raise ValueError("{} is sharded: start the API with DB_SHARDS=1 "
+                         "once to merge its shards".format(s_class))
+
+    count = 0
+    if to == "binary":
+        attributes = tuple(cls.indexed_attributes)
+        with open(json_path, 'r') as f, open(binary_path + ".tmp", 'wb') \
+                as out:
+            records = ((obj_id, encode_record(obj_json), tuple(
+                obj_json.get(attr) for attr in attributes))
+                for obj_id, obj_json, _ in iter_json_object(f))
+            count = len(dump_binary(out, records, attributes))
+        os.replace(binary_path + ".tmp", binary_path)
+    else:
+        mapped = map_file(binary_path)
+        _, ids, offsets, _ = read_binary_index(mapped)
+        with open(json_path + ".tmp", 'w') as out:
+            dump_records(out, (
+                (obj_id, json.dumps(read_record(mapped, offset)))
+                for obj_id, offset in zip(ids, offsets)))
+        mapped.close()
+        count = len(ids)
+        os.replace(json_path + ".tmp", json_path)
+    return count
+
+
+def main():
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("model", choices=sorted(MODELS),
+                        help="class whose data file is converted")
+    parser.add_argument("to", choices=("binary", "json"),
+                        help="format to convert to")
+    args = parser.parse_args()
+    try:
+        count = convert(MODELS[args.model], args.to)
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    print("converted {:,} {} records to {}".format(
+        count, args.model, args.to), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
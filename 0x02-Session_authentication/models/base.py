@@ -1,40 +1,209 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
-from os import path
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, TypeVar, List, Iterable, Iterator
+from os import getenv
+import atexit
+import heapq
+import itertools
 import json
+import operator
+import threading
 import uuid
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+# Objects of the file backend, by class name then id; values are raw
+# records until first accessed
 DATA = {}
+BATCH = threading.local()
+FIELD_PLANS = {}
+QUERY_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "in": lambda value, arg: value in arg,
+    "startswith": lambda value, arg: value.startswith(arg),
+}
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string, with the C ISO parser when
+    the string has the fixed YYYY-MM-DDTHH:MM:SS shape
+    """
+    if len(value) == 19 and value[10] == "T":
+        return datetime.fromisoformat(value)
+    return datetime.strptime(value, TIMESTAMP_FORMAT)
+
+
+def to_timestamp(value: datetime) -> int:
+    """ Whole seconds between the epoch and the naive UTC datetime value
+    """
+    return (value - EPOCH) // timedelta(seconds=1)
+
+
+def from_timestamp(value: int) -> datetime:
+    """ Naive UTC datetime of a to_timestamp() value
+    """
+    return EPOCH + timedelta(seconds=value)
+
+
+@lru_cache(maxsize=4096)
+def format_timestamp(value: int) -> str:
+    """ Format a to_timestamp() value with TIMESTAMP_FORMAT
+    Whole seconds, so isoformat() gives the same string faster
+    """
+    return from_timestamp(value).isoformat()
+
+
+def json_bytes(obj_json: dict) -> bytes:
+    """ Compact JSON with sorted keys, as jsonify() writes it; encoded
+    with orjson when it is installed
+    """
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj_json, option=orjson.OPT_SORT_KEYS)
+            # json escapes non-ASCII characters, orjson does not
+            if data.isascii():
+                return data
+        except TypeError:
+            pass
+    return json.dumps(obj_json, sort_keys=True,
+                      separators=(",", ":")).encode()
+
+
+def parse_filters(filters: dict) -> List[tuple]:
+    """ (attribute, operator, argument) triples of query filters, keyed
+    "attribute" for equality or "attribute__operator"
+    """
+    conditions = []
+    for key, arg in filters.items():
+        attr, _, op = key.rpartition("__")
+        if not attr or op not in QUERY_OPERATORS:
+            attr, op = key, "eq"
+        conditions.append((attr, op, arg))
+    return conditions
+
+
+def matches(value, op: str, arg) -> bool:
+    """ Whether value satisfies the query operator op with arg; None
+    only ever equals None
+    """
+    if value is None and op not in ("eq", "ne", "in"):
+        return False
+    try:
+        return QUERY_OPERATORS[op](value, arg)
+    except (TypeError, AttributeError):
+        return False
+
+
+def order_key(attr: str) -> Callable:
+    """ Sort key on attribute attr, None sorting after any value
+    """
+    def key(obj):
+        value = getattr(obj, attr)
+        return (1,) if value is None else (0, value)
+    return key
+
+
+def paginate(objs: Iterable, order_by: str = None, limit: int = None,
+             offset: int = 0) -> Iterator:
+    """ Order objs by the attribute order_by ("-" prefixed for
+    descending order) and keep limit of them after offset, lazily when
+    no order is asked
+    """
+    end = None if limit is None else offset + limit
+    if order_by:
+        key = order_key(order_by.lstrip("-"))
+        reverse = order_by.startswith("-")
+        if end is None:
+            objs = sorted(objs, key=key, reverse=reverse)
+        elif reverse:
+            objs = heapq.nlargest(end, objs, key=key)
+        else:
+            objs = heapq.nsmallest(end, objs, key=key)
+    return itertools.islice(objs, offset, end)
 
 
 class Base():
     """ Base class
+    Attributes live in __slots__ and timestamps are kept as whole
+    seconds since the epoch; subclasses declare their own __slots__
     """
 
+    __slots__ = ('id', '_created_at', '_updated_at', '_json_cache')
+    indexed_attributes = ()
+    _storage = None
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
-        s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
-
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = parse_timestamp(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = parse_timestamp(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
+    @staticmethod
+    def storage() -> TypeVar('Storage'):
+        """ The storage backend chosen by DB_BACKEND: "json" files, the
+        default, or "sqlite"
+        """
+        if Base._storage is None:
+            if getenv("DB_BACKEND", "json") == "sqlite":
+                from models.engine.sqlite_storage import SQLiteStorage
+                Base._storage = SQLiteStorage()
+            else:
+                from models.engine.file_storage import FileStorage
+                Base._storage = FileStorage()
+        return Base._storage
+
+    @property
+    def created_at(self) -> datetime:
+        """ Creation time, as a naive UTC datetime
+        """
+        return from_timestamp(self._created_at)
+
+    @created_at.setter
+    def created_at(self, value: datetime):
+        """ Setter of the creation time
+        """
+        self._created_at = to_timestamp(value)
+
+    @property
+    def updated_at(self) -> datetime:
+        """ Last update time, as a naive UTC datetime
+        """
+        return from_timestamp(self._updated_at)
+
+    @updated_at.setter
+    def updated_at(self, value: datetime):
+        """ Setter of the last update time
+        """
+        self._updated_at = to_timestamp(value)
+
+    def __setattr__(self, name: str, value):
+        """ Set an attribute, dropping the cached to_json() output
+        """
+        object.__setattr__(self, '_json_cache', None)
+        object.__setattr__(self, name, value)
+
     def __eq__(self, other: TypeVar('Base')) -> bool:
         """ Equality
         """
@@ -44,94 +213,149 @@ class Base():
             return False
         return (self.id == other.id)
 
+    @classmethod
+    def field_plan(cls) -> tuple:
+        """ Slots serialized after id and the timestamps, in declaration
+        order, worked out once per class
+        """
+        plan = FIELD_PLANS.get(cls)
+        if plan is None:
+            plan = FIELD_PLANS[cls] = tuple(
+                key for klass in reversed(cls.__mro__) if klass is not Base
+                for key in klass.__dict__.get('__slots__', ())
+                if key not in ('__dict__', '__weakref__'))
+        return plan
+
+    def serialized(self, key) -> object:
+        """ Cached serialized form key of the object, built on first use
+        after each change: True for to_json(True), False for to_json()
+        and "bytes" for to_json_bytes()
+        """
+        cache = getattr(self, '_json_cache', None)
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, '_json_cache', cache)
+        if key in cache:
+            return cache[key]
+        if key is False:
+            value = {k: v for k, v in self.serialized(True).items()
+                     if k[0] != '_'}
+        elif key == "bytes":
+            value = json_bytes(self.serialized(False))
+        else:
+            value = {
+                "id": self.id,
+                "created_at": format_timestamp(self._created_at),
+                "updated_at": format_timestamp(self._updated_at),
+            }
+            unset = object()
+            items = [(k, getattr(self, k, unset))
+                     for k in self.__class__.field_plan()]
+            items.extend(getattr(self, '__dict__', {}).items())
+            for k, v in items:
+                if v is unset:
+                    continue
+                if type(v) is datetime:
+                    value[k] = v.strftime(TIMESTAMP_FORMAT)
+                else:
+                    value[k] = v
+        cache[key] = value
+        return value
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
-        result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
-            if type(value) is datetime:
-                result[key] = value.strftime(TIMESTAMP_FORMAT)
-            else:
-                result[key] = value
-        return result
+        return dict(self.serialized(bool(for_serialization)))
+
+    def to_json_bytes(self) -> bytes:
+        """ to_json() encoded as jsonify() does
+        """
+        return self.serialized("bytes")
 
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file, or prepare the table of the
+        class with the SQLite backend
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
-            return
-
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+        cls.storage().load(cls)
 
     @classmethod
     def save_to_file(cls):
-        """ Save all objects to file
+        """ Save all objects of the class to file, or commit them with
+        the SQLite backend
         """
-        s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        cls.storage().save_to_file(cls)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+    @staticmethod
+    def flush(wait: bool = False):
+        """ Write all deferred changes, coalesced to one write per class
+        Call it before shutting down in write-behind mode; at exit it
+        also waits for a running journal compaction
+        """
+        Base.storage().flush(wait)
+
+    @staticmethod
+    @contextmanager
+    def batch():
+        """ Defer the writes of saves and removals until the outermost
+        block exits
+        """
+        BATCH.depth = getattr(BATCH, "depth", 0) + 1
+        try:
+            yield
+        finally:
+            BATCH.depth -= 1
+            if BATCH.depth == 0:
+                Base.flush()
 
     def save(self):
         """ Save current object
         """
-        s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        # Values changed in place are not seen by __setattr__
+        object.__setattr__(self, '_json_cache', None)
+        self.storage().save(self)
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        self.storage().remove(self)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
-        s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return cls.storage().count(cls)
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
-        """ Return all objects
+        """ Return all objects, built as they are iterated
         """
-        return cls.search()
+        return cls.query()
 
     @classmethod
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
-        s_class = cls.__name__
-        return DATA[s_class].get(id)
+        return cls.storage().get(cls, id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
-        s_class = cls.__name__
-        def _search(obj):
-            if len(attributes) == 0:
-                return True
-            for k, v in attributes.items():
-                if (getattr(obj, k) != v):
-                    return False
-            return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+        return cls.storage().search(cls, attributes)
+
+    @classmethod
+    def query(cls, filters: dict = {}, order_by: str = None,
+              limit: int = None, offset: int = 0
+              ) -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the objects matching all filters
+        Filters are keyed "attribute" for equality or
+        "attribute__operator", operator being one of eq, ne, lt, lte,
+        gt, gte, in or startswith. order_by names an attribute, prefixed
+        with "-" for descending order; None sorts last in ascending order
+        """
+        return cls.storage().query(cls, filters, order_by, limit, offset)
+
+
+atexit.register(Base.flush, True)
@@ -0,0 +1,781 @@
+#!/usr/bin/env python3
+""" FileStorage module
+"""
+from contextlib import contextmanager
+from os import getenv, path
+from typing import TypeVar, List, Iterable, Iterator
+import concurrent.futures
+import fcntl
+import glob
+import json
+import os
+import threading
+import uuid
+import zlib
+
+from models.base import BATCH, DATA, matches, paginate, parse_filters
+from models.engine.formats import dump_binary, dump_records, \
+    encode_record, iter_json_object, map_file, read_binary_index, \
+    read_json_shard, read_record, record_bytes
+from models.engine.storage import Storage
+
+
+RAW_TYPES = (str, int)
+SHARD_BITS = 40
+
+
+def journal_enabled() -> bool:
+    """ Whether changes are appended to a journal (DB_JOURNAL=1)
+    instead of rewriting the whole data file
+    """
+    return getenv("DB_JOURNAL", "0") == "1"
+
+
+def write_behind_interval() -> float:
+    """ Seconds between background flushes of deferred changes
+    (DB_WRITE_BEHIND_INTERVAL), 0 when changes are written right away
+    """
+    return float(getenv("DB_WRITE_BEHIND_INTERVAL", "0"))
+
+
+def binary_format() -> bool:
+    """ Whether snapshots use the binary format (DB_FORMAT=binary)
+    instead of JSON
+    """
+    return getenv("DB_FORMAT", "json") == "binary"
+
+
+def shard_count() -> int:
+    """ Number of files the objects of a class are split into
+    (DB_SHARDS, default 1)
+    """
+    return max(1, int(getenv("DB_SHARDS", "1")))
+
+
+def shard_of(obj_id: str, shards: int) -> int:
+    """ Shard holding the object obj_id among shards
+    """
+    return zlib.crc32(obj_id.encode()) % shards
+
+
+def partition(ids: Iterable[str], shards: int) -> List[dict]:
+    """ The ids of each of shards shards, as dicts keyed by id
+    """
+    parts = [{} for _ in range(shards)]
+    for obj_id in ids:
+        parts[shard_of(obj_id, shards)][obj_id] = None
+    return parts
+
+
+def manifest_path(s_class: str) -> str:
+    """ Manifest of the sharded files of the class s_class
+    """
+    return ".db_{}.shards".format(s_class)
+
+
+def stored_shards(s_class: str) -> int:
+    """ Number of shards of the files of s_class on disk, from the
+    manifest; a single file has no manifest
+    """
+    try:
+        with open(manifest_path(s_class), 'r') as f:
+            return json.load(f)["shards"]
+    except FileNotFoundError:
+        return 1
+
+
+def data_path(s_class: str, shard: int = 0, shards: int = 1) -> str:
+    """ Snapshot file of the class s_class in the current format, or
+    of one of its shards
+    """
+    ext = "bin" if binary_format() else "json"
+    if shards == 1:
+        return ".db_{}.{}".format(s_class, ext)
+    return ".db_{}.{}-of-{}.{}".format(s_class, shard, shards, ext)
+
+
+def storage_paths(s_class: str) -> List[str]:
+    """ Files holding the objects of the class s_class; the manifest
+    of sharded files is rewritten with every shard
+    """
+    paths = [manifest_path(s_class), data_path(s_class)]
+    if not journal_enabled():
+        return paths
+    journal_path = ".db_{}.journal".format(s_class)
+    return paths + [journal_path, journal_path + ".compacting"]
+
+
+def file_stamp(s_class: str) -> tuple:
+    """ (mtime, size, inode) of each storage file of s_class, None for
+    missing files; it changes whenever a process writes them
+    """
+    stamp = []
+    for file_path in storage_paths(s_class):
+        try:
+            st = os.stat(file_path)
+            stamp.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def is_locked(file_path: str) -> bool:
+    """ Whether another open file holds a flock on file_path
+    """
+    try:
+        with open(file_path, 'r') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+    except FileNotFoundError:
+        return False
+
+
+class FileStorage(Storage):
+    """ Objects held in memory and persisted to .db_<Class>.json files,
+    or .db_<Class>.bin binary snapshots with DB_FORMAT=binary, split by
+    id into DB_SHARDS files; the default backend
+    Objects loaded from file stay raw records, JSON text or the offset
+    of a binary record, until first accessed
+    """
+
+    def __init__(self):
+        """ Initialize a FileStorage instance
+        """
+        self.data = DATA
+        self.indexes = {}
+        self.indexed_values = {}
+        self.dirty = {}
+        self.stamps = {}
+        self.maps = {}
+        self.shard_ids = {}
+        self.compacting = {}
+        self.lock = threading.RLock()
+        self.class_locks = {}
+        self.file_locks = threading.local()
+        self.write_behind = None
+
+    def objects(self, cls) -> dict:
+        """ Objects of the class cls, by id
+        """
+        return self.data.setdefault(cls.__name__, {})
+
+    def class_lock(self, cls) -> threading.RLock:
+        """ In-process lock of the objects of cls, held only for short
+        changes of the data and never while waiting on file_lock()
+        """
+        lock = self.class_locks.get(cls.__name__)
+        if lock is None:
+            lock = self.class_locks.setdefault(
+                cls.__name__, threading.RLock())
+        return lock
+
+    @contextmanager
+    def file_lock(self, cls):
+        """ Hold the cross-process lock of the storage files of cls
+        Each holder opens the lock file anew, so the flock also keeps
+        out the other threads of the process; re-entrant per thread
+        """
+        s_class = cls.__name__
+        held = self.file_locks.__dict__.setdefault("held", set())
+        if s_class in held:
+            yield
+            return
+        with open(".db_{}.lock".format(s_class), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            held.add(s_class)
+            try:
+                yield
+            finally:
+                held.discard(s_class)
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, cls, parallel: bool = True):
+        """ Load all objects of cls from file
+        The file is parsed incrementally and objects are kept as raw
+        records until first accessed, see hydrate(). A binary snapshot
+        is memory-mapped and only its index is read. In journal mode the
+        snapshot is followed by a replay of the journal, and of the
+        journal of an interrupted compaction
+        With parallel, sharded JSON files are parsed by a pool of
+        processes, as long as no other thread runs: forking a threaded
+        process can leave the children deadlocked. Reloads on the
+        request path read them in turn
+        """
+        s_class = cls.__name__
+        shards = stored_shards(s_class)
+        workers = min(shards, os.cpu_count() or 1)
+        if not parallel or threading.active_count() > 1:
+            workers = 1
+        with self.file_lock(cls):
+            self.data[s_class] = {}
+            self.maps[s_class] = {}
+            self.shard_ids[s_class] = [{} for _ in range(shards)]
+            self.reindex(cls)
+            file_paths = [data_path(s_class, shard, shards)
+                          for shard in range(shards)]
+            stored = [file_path for file_path in file_paths
+                      if path.exists(file_path)]
+            if binary_format():
+                for shard, file_path in enumerate(file_paths):
+                    if path.exists(file_path):
+                        self.load_binary(cls, shard, file_path)
+            elif workers > 1:
+                attributes = tuple(cls.indexed_attributes)
+                with concurrent.futures.ProcessPoolExecutor(workers) \
+                        as executor:
+                    for ids, raws, values in executor.map(
+                            read_json_shard, stored,
+                            [attributes] * len(stored)):
+                        self.data[s_class].update(zip(ids, raws))
+                        for obj_id, obj_values in zip(ids, values):
+                            self.index_values(cls, obj_id, dict(
+                                zip(attributes, obj_values)))
+            else:
+                for file_path in stored:
+                    with open(file_path, 'r') as f:
+                        for obj_id, obj_json, raw in iter_json_object(f):
+                            self.load_record(cls, obj_id, obj_json, raw)
+            parts = self.shard_ids[s_class]
+            if shards > 1:
+                for obj_id in self.data[s_class]:
+                    parts[shard_of(obj_id, shards)][obj_id] = None
+            else:
+                parts[0] = dict.fromkeys(self.data[s_class])
+
+            journal_path = ".db_{}.journal".format(s_class)
+            self.replay_journal(cls, journal_path + ".compacting")
+            self.replay_journal(cls, journal_path)
+            if path.exists(journal_path + ".compacting") and \
+                    not is_locked(journal_path + ".compacting"):
+                # Compaction was interrupted: its changes are loaded now
+                self.save_to_file(cls)
+                os.remove(journal_path + ".compacting")
+                if path.exists(journal_path):
+                    os.remove(journal_path)
+                for file_path in glob.glob(".db_{}.*.compact".format(
+                        s_class)):
+                    os.remove(file_path)
+            if shards != shard_count():
+                # DB_SHARDS changed: spread the objects over the new shards
+                self.save_to_file(cls)
+            self.stamps[s_class] = file_stamp(s_class)
+
+    def load_binary(self, cls, shard: int, file_path: str):
+        """ Map the binary snapshot of one shard and read its index
+        """
+        s_class = cls.__name__
+        mapped = self.maps[s_class][shard] = map_file(file_path)
+        attributes, ids, offsets, columns = read_binary_index(mapped)
+        base = shard << SHARD_BITS
+        self.data[s_class].update(
+            zip(ids, (base | offset for offset in offsets)))
+        wanted = [attr for attr in cls.indexed_attributes
+                  if attr in attributes]
+        columns = [columns[attributes.index(attr)] for attr in wanted]
+        for obj_id, *values in zip(ids, *columns):
+            self.index_values(cls, obj_id, dict(zip(wanted, values)))
+        if len(wanted) < len(cls.indexed_attributes):
+            # Indexed attributes changed since the file was written
+            self.reindex(cls)
+
+    def refresh(self, cls):
+        """ Reload the objects of cls if another process changed their
+        files; changes not written yet by this process are kept
+        """
+        if not self.stale(cls):
+            return
+        with self.file_lock(cls):
+            if self.stale(cls):
+                self.reload(cls, list(self.dirty.get(cls, {}).values()))
+
+    def stale(self, cls) -> bool:
+        """ Whether the files of cls changed since this process last
+        read or wrote them, found with a stat per file and no lock
+        """
+        s_class = cls.__name__
+        missing = (None,) * len(storage_paths(s_class))
+        return self.stamps.get(s_class, missing) != file_stamp(s_class)
+
+    def reload(self, cls, entries: List[dict]):
+        """ Load the objects of cls from file again, then apply on top
+        the changes entries made by this process
+        """
+        live = {entry["id"]: self.objects(cls).get(entry["id"])
+                for entry in entries if entry["op"] == "save"}
+        self.load(cls, parallel=False)
+        objects = self.objects(cls)
+        for entry in entries:
+            obj = live.get(entry["id"])
+            if obj is not None:
+                objects[obj.id] = obj
+                self.index(obj)
+            else:
+                objects.pop(entry["id"], None)
+                self.unindex_id(cls, entry["id"])
+
+    def load_record(self, cls, obj_id: str, obj_json: dict, raw: str):
+        """ Store and index one object as its raw JSON record
+        """
+        self.data[cls.__name__][obj_id] = raw
+        self.index_values(cls, obj_id, {
+            attr: obj_json.get(attr) for attr in cls.indexed_attributes})
+
+    def replay_journal(self, cls, journal_path: str):
+        """ Apply the changes of a journal file to the objects of cls
+        A last line torn by a crash mid-append is dropped
+        """
+        if not path.exists(journal_path):
+            return
+        objects = self.objects(cls)
+        with open(journal_path, 'rb+') as f:
+            end = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                entry = json.loads(line)
+                if entry["op"] == "save":
+                    self.load_record(cls, entry["obj"]["id"], entry["obj"],
+                                     json.dumps(entry["obj"]))
+                else:
+                    objects.pop(entry["id"], None)
+                    self.unindex_id(cls, entry["id"])
+                self.track_shard(cls, entry)
+            f.truncate(end)
+
+    def track_shard(self, cls, entry: dict):
+        """ Keep the ids of each shard of cls in step with a change
+        """
+        parts = self.shard_ids.get(cls.__name__)
+        if parts is None:
+            return
+        ids = parts[shard_of(entry["id"], len(parts))]
+        if entry["op"] == "save":
+            ids[entry["id"]] = None
+        else:
+            ids.pop(entry["id"], None)
+
+    def save_to_file(self, cls, entries: List[dict] = None):
+        """ Save all objects of cls to file
+        Files are written aside and renamed over the old ones, so a
+        crash never leaves them half written. With DB_SHARDS, only the
+        shards holding the changes entries are rewritten; without
+        entries, or when DB_SHARDS changed, all objects are spread over
+        a new set of shards
+        """
+        s_class = cls.__name__
+        shards = shard_count()
+        objects = self.objects(cls)
+        with self.file_lock(cls):
+            parts = self.shard_ids.get(s_class)
+            if entries is None or parts is None or len(parts) != shards:
+                parts = self.shard_ids[s_class] = partition(objects, shards)
+                targets = range(shards)
+            else:
+                for entry in entries:
+                    self.track_shard(cls, entry)
+                targets = sorted({shard_of(entry["id"], shards)
+                                  for entry in entries})
+            maps = self.maps.setdefault(s_class, {})
+            offsets = self.write_shards(
+                cls, {shard: [(obj_id, objects[obj_id])
+                              for obj_id in list(parts[shard])
+                              if obj_id in objects]
+                      for shard in targets}, shards, maps, ".tmp")
+            self.install_shards(cls, list(targets), shards, ".tmp")
+            with self.class_lock(cls):
+                for shard, shard_offsets in offsets.items():
+                    if shard_offsets is None:
+                        continue
+                    # Raw records now point into the new file
+                    maps[shard] = map_file(data_path(s_class, shard, shards))
+                    for obj_id, offset in shard_offsets.items():
+                        if type(objects[obj_id]) is int:
+                            objects[obj_id] = shard << SHARD_BITS | offset
+                for shard in [shard for shard in maps if shard >= shards]:
+                    del maps[shard]
+
+    def write_shards(self, cls, parts: dict, shards: int, maps: dict,
+                     suffix: str) -> dict:
+        """ Write the (id, object) pairs of each shard in parts, next to
+        its file with suffix appended; return the offsets of each shard
+        """
+        return {shard: self.write_snapshot(
+                    cls, data_path(cls.__name__, shard, shards) + suffix,
+                    objs, maps)
+                for shard, objs in parts.items()}
+
+    def install_shards(self, cls, targets: List[int], shards: int,
+                       suffix: str):
+        """ Rename the files written by write_shards() into place, then
+        record the layout in the manifest and drop the files of a former
+        one
+        """
+        s_class = cls.__name__
+        old_shards = stored_shards(s_class)
+        for shard in targets:
+            file_path = data_path(s_class, shard, shards)
+            os.replace(file_path + suffix, file_path)
+        if shards > 1:
+            with open(manifest_path(s_class) + ".tmp", 'w') as f:
+                json.dump({"shards": shards, "generation": uuid.uuid4().hex},
+                          f)
+            os.replace(manifest_path(s_class) + ".tmp",
+                       manifest_path(s_class))
+        elif path.exists(manifest_path(s_class)):
+            os.remove(manifest_path(s_class))
+        if old_shards != shards:
+            for shard in range(old_shards):
+                file_path = data_path(s_class, shard, old_shards)
+                if path.exists(file_path):
+                    os.remove(file_path)
+
+    def write_snapshot(self, cls, file_path: str, objs: List[tuple],
+                       maps: dict = {}) -> dict:
+        """ Write the (id, object) pairs objs to file_path in the current
+        format; binary raw records are copied from the shard maps
+        Return the offset of each id in a binary snapshot
+        """
+        if not binary_format():
+            with open(file_path, 'w') as f:
+                dump_records(f, objs)
+            return None
+
+        attributes = tuple(cls.indexed_attributes)
+        indexed = self.indexed_values.get(cls.__name__, {})
+        mask = (1 << SHARD_BITS) - 1
+
+        def records():
+            for obj_id, obj in objs:
+                if type(obj) is int:
+                    values = indexed.get(obj_id, {})
+                    yield obj_id, record_bytes(
+                        maps[obj >> SHARD_BITS], obj & mask), tuple(
+                        values.get(attr) for attr in attributes)
+                    continue
+                obj_json = json.loads(obj) if type(obj) is str \
+                    else obj.to_json(True)
+                yield obj_id, encode_record(obj_json), tuple(
+                    obj_json.get(attr) for attr in attributes)
+
+        with open(file_path, 'wb') as f:
+            return dump_binary(f, records(), attributes)
+
+    def append_to_journal(self, cls, entries: List[dict]):
+        """ Append changes to the journal of cls, in O(1) per change
+        Past DB_JOURNAL_MAX_BYTES the journal is folded into a new
+        snapshot in the background
+        """
+        s_class = cls.__name__
+        journal_path = ".db_{}.journal".format(s_class)
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self.class_lock(cls):
+            with open(journal_path, 'a') as f:
+                f.write(lines)
+                size = f.tell()
+            max_bytes = int(getenv("DB_JOURNAL_MAX_BYTES", 1 << 20))
+            if size < max_bytes or s_class in self.compacting or \
+                    path.exists(journal_path + ".compacting"):
+                return
+            os.replace(journal_path, journal_path + ".compacting")
+            # Tells other processes the compaction is still running
+            compacting = open(journal_path + ".compacting", 'r')
+            fcntl.flock(compacting, fcntl.LOCK_EX)
+            objs = list(self.objects(cls).items())
+            maps = dict(self.maps.get(s_class, {}))
+            thread = self.compacting[s_class] = threading.Thread(
+                target=self.compact, args=(cls, objs, compacting, maps),
+                daemon=True)
+            thread.start()
+
+    def compact(self, cls, objs: List[tuple], compacting, maps: dict = {}):
+        """ Write a snapshot of the (id, object) pairs objs, then drop
+        the rotated journal, whose file compacting is held locked
+        Changes made meanwhile go to the new journal, which is replayed
+        on top of the snapshot
+        """
+        s_class = cls.__name__
+        shards = shard_count()
+        parts = {shard: [] for shard in range(shards)}
+        for obj_id, obj in objs:
+            parts[shard_of(obj_id, shards)].append((obj_id, obj))
+        try:
+            self.write_shards(cls, parts, shards, maps, ".compact")
+            with self.file_lock(cls):
+                current = self.stamps.get(s_class) == file_stamp(s_class)
+                self.install_shards(cls, list(parts), shards, ".compact")
+                self.shard_ids.pop(s_class, None)
+                os.remove(".db_{}.journal.compacting".format(s_class))
+                if current:
+                    self.stamps[s_class] = file_stamp(s_class)
+        finally:
+            compacting.close()
+            self.compacting.pop(s_class, None)
+
+    def persist(self, cls, entry: dict):
+        """ Write one change to the files of cls, or defer it inside a
+        Base.batch() block or in write-behind mode
+        """
+        with self.lock:
+            pending = self.dirty.get(cls)
+            if getattr(BATCH, "depth", 0) == 0 and \
+                    write_behind_interval() <= 0:
+                if pending is not None:
+                    # This change supersedes a deferred one
+                    pending.pop(entry.get("id"), None)
+                deferred = False
+            else:
+                if pending is None:
+                    pending = self.dirty[cls] = {}
+                pending.pop(entry["id"], None)
+                pending[entry["id"]] = entry
+                count = sum(len(entries) for entries in self.dirty.values())
+                if getattr(BATCH, "depth", 0) > 0:
+                    return
+                self.start_write_behind()
+                threshold = int(getenv("DB_WRITE_BEHIND_THRESHOLD", 0))
+                deferred = True
+        # Files are written outside self.lock, which never waits on a flock
+        if not deferred:
+            self.write_changes(cls, [entry])
+        elif 0 < threshold <= count:
+            self.flush()
+
+    def write_changes(self, cls, entries: List[dict]):
+        """ Write changes of the class cls to its files
+        The files are locked against other processes, and reloaded
+        first if one of them wrote since they were last read
+        """
+        s_class = cls.__name__
+        with self.file_lock(cls):
+            if self.stale(cls):
+                self.reload(
+                    cls, entries + list(self.dirty.get(cls, {}).values()))
+            if journal_enabled():
+                self.append_to_journal(cls, entries)
+            else:
+                self.save_to_file(cls, entries)
+            self.stamps[s_class] = file_stamp(s_class)
+
+    def start_write_behind(self):
+        """ Start the timer flushing deferred changes every
+        DB_WRITE_BEHIND_INTERVAL seconds, once per process
+        """
+        if self.write_behind is not None:
+            return
+
+        def tick():
+            self.write_behind = threading.Timer(
+                write_behind_interval(), tick)
+            self.write_behind.daemon = True
+            self.write_behind.start()
+            self.flush()
+
+        self.write_behind = threading.Timer(write_behind_interval(), tick)
+        self.write_behind.daemon = True
+        self.write_behind.start()
+
+    def reindex(self, cls):
+        """ Rebuild the indexes of cls from its objects
+        """
+        s_class = cls.__name__
+        self.indexes[s_class] = {attr: {} for attr in cls.indexed_attributes}
+        self.indexed_values[s_class] = {}
+        for obj_id, obj in self.objects(cls).items():
+            if type(obj) in RAW_TYPES:
+                obj_json = self.decode_record(cls, obj)
+                self.index_values(cls, obj_id, {
+                    attr: obj_json.get(attr)
+                    for attr in cls.indexed_attributes})
+            else:
+                self.index(obj)
+
+    def index(self, obj: TypeVar('Base')):
+        """ Add obj to the indexes of its class
+        Values are indexed as they are when the object is saved
+        """
+        cls = obj.__class__
+        if cls.__name__ not in self.indexes:
+            self.reindex(cls)
+            return
+        self.index_values(cls, obj.id, {
+            attr: getattr(obj, attr) for attr in cls.indexed_attributes})
+
+    def index_values(self, cls, obj_id: str, values: dict):
+        """ Index the object obj_id under its indexed attribute values
+        """
+        s_class = cls.__name__
+        old = self.indexed_values[s_class].get(obj_id, {})
+        for attr, value in values.items():
+            if attr in old:
+                if old[attr] == value:
+                    continue
+                self.unindex_value(cls, obj_id, attr, old[attr])
+            self.indexes[s_class][attr].setdefault(value, {})[obj_id] = None
+        self.indexed_values[s_class][obj_id] = values
+
+    def unindex_value(self, cls, obj_id: str, attr: str, value):
+        """ Drop the object obj_id from one index entry
+        """
+        index = self.indexes[cls.__name__][attr]
+        ids = index.get(value, {})
+        ids.pop(obj_id, None)
+        if not ids:
+            index.pop(value, None)
+
+    def unindex_id(self, cls, obj_id: str):
+        """ Remove the object obj_id from the indexes of cls
+        """
+        s_class = cls.__name__
+        if s_class not in self.indexes:
+            return
+        old = self.indexed_values[s_class].pop(obj_id, {})
+        for attr, value in old.items():
+            self.unindex_value(cls, obj_id, attr, value)
+
+    def hydrate(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Return the object obj_id, building it on first access
+        if it is still a raw record
+        """
+        objects = self.objects(cls)
+        obj = objects.get(obj_id)
+        if type(obj) in RAW_TYPES:
+            with self.class_lock(cls):
+                obj = objects.get(obj_id)
+                if type(obj) in RAW_TYPES:
+                    obj = objects[obj_id] = cls(
+                        **self.decode_record(cls, obj))
+        return obj
+
+    def decode_record(self, cls, raw) -> dict:
+        """ Attributes of a raw record: JSON text, or the offset of a
+        record in a memory-mapped binary snapshot
+        """
+        if type(raw) is str:
+            return json.loads(raw)
+        return read_record(self.maps[cls.__name__][raw >> SHARD_BITS],
+                           raw & ((1 << SHARD_BITS) - 1))
+
+    def save(self, obj: TypeVar('Base')):
+        """ Store obj in memory and persist the change
+        """
+        cls = obj.__class__
+        self.objects(cls)[obj.id] = obj
+        self.index(obj)
+        self.persist(
+            cls, {"op": "save", "id": obj.id, "obj": obj.to_json(True)})
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Drop obj from memory and persist the change
+        """
+        cls = obj.__class__
+        if self.objects(cls).get(obj.id) is not None:
+            del self.objects(cls)[obj.id]
+            self.unindex_id(cls, obj.id)
+            self.persist(cls, {"op": "remove", "id": obj.id})
+
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self.refresh(cls)
+        return self.hydrate(cls, obj_id)
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        An equality on an indexed attribute narrows the scan down to
+        the objects holding that value
+        """
+        s_class = cls.__name__
+        self.refresh(cls)
+
+        def _search(obj):
+            if obj is None:
+                return False
+            if len(attributes) == 0:
+                return True
+            for k, v in attributes.items():
+                if (getattr(obj, k) != v):
+                    return False
+            return True
+
+        ids = self.objects(cls)
+        for k, v in attributes.items():
+            if k in self.indexes.get(s_class, {}):
+                try:
+                    ids = self.indexes[s_class][k].get(v, {})
+                except TypeError:
+                    continue
+                break
+
+        return list(filter(_search, (self.hydrate(cls, obj_id)
+                                     for obj_id in list(ids))))
+
+    def query(self, cls, filters: dict, order_by: str, limit: int,
+              offset: int) -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the objects matching the filters
+        Filters on indexed attributes select candidates from the index
+        values, the smallest selection is scanned
+        """
+        s_class = cls.__name__
+        self.refresh(cls)
+        conditions = parse_filters(filters)
+        ids = None
+        for attr, op, arg in conditions:
+            index = self.indexes.get(s_class, {}).get(attr)
+            if index is None:
+                continue
+            try:
+                if op == "eq":
+                    found = index.get(arg, {})
+                elif op == "in":
+                    found = {obj_id: None for value in arg
+                             for obj_id in index.get(value, {})}
+                else:
+                    found = {obj_id: None
+                             for value, value_ids in list(index.items())
+                             if matches(value, op, arg)
+                             for obj_id in value_ids}
+            except TypeError:
+                # Unhashable argument
+                continue
+            if ids is None or len(found) < len(ids):
+                ids = found
+
+        def _query(obj):
+            return obj is not None and all(
+                matches(getattr(obj, attr), op, arg)
+                for attr, op, arg in conditions)
+
+        candidates = list(self.objects(cls) if ids is None else ids)
+        return paginate(filter(_query, (self.hydrate(cls, obj_id)
+                                        for obj_id in candidates)),
+                        order_by, limit, offset)
+
+    def count(self, cls) -> int:
+        """ Count all objects
+        """
+        self.refresh(cls)
+        return len(self.objects(cls).keys())
+
+    def flush(self, wait: bool = False):
+        """ Write all deferred changes, coalesced to one write per class
+        The changes of a class are taken once its files are locked, so
+        a reload meanwhile still sees them in self.dirty. With wait, the
+        running compactions are then waited for, so the process does not
+        exit with their files half written
+        """
+        with self.lock:
+            classes = list(self.dirty)
+        for cls in classes:
+            with self.file_lock(cls):
+                with self.lock:
+                    entries = self.dirty.pop(cls, {})
+                if entries:
+                    self.write_changes(cls, list(entries.values()))
+        if wait:
+            for thread in list(self.compacting.values()):
+                thread.join()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+""" Formats of the data files of FileStorage: one JSON object keyed by
+id, or a binary snapshot of marshal records followed by a columnar index
+"""
+from typing import Iterable
+import json
+import marshal
+import mmap
+import re
+import struct
+
+
+BINARY_MAGIC = b"BDB1"
+BINARY_FOOTER = struct.Struct("<Q4s")
+BINARY_LENGTH = struct.Struct("<I")
+
+
+def iter_json_object(f, chunk_size: int = 1 << 16) -> Iterable[tuple]:
+    """ Yield the (key, value, value as JSON text) triples of the JSON
+    object in file f, reading it chunk_size characters at a time
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"\s*")
+    buf, pos = "", 0
+
+    def parse(parser):
+        nonlocal buf, pos
+        while True:
+            start = pos = whitespace.match(buf, pos).end()
+            try:
+                value, pos = parser(buf, pos)
+                return value, start
+            except (ValueError, IndexError) as error:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError("Truncated JSON object") from error
+                buf, pos = buf[pos:] + chunk, 0
+
+    def token(buf, pos):
+        return buf[pos], pos + 1
+
+    if parse(token)[0] != "{":
+        raise ValueError("Expecting a JSON object")
+    if parse(token)[0] == "}":
+        return
+    pos -= 1
+    while True:
+        key, _ = parse(decoder.raw_decode)
+        if parse(token)[0] != ":":
+            raise ValueError("Expecting ':' delimiter")
+        value, start = parse(decoder.raw_decode)
+        yield key, value, buf[start:pos]
+        delimiter, _ = parse(token)
+        if delimiter == "}":
+            return
+        if delimiter != ",":
+            raise ValueError("Expecting ',' delimiter")
+
+
+def dump_records(f, objs: Iterable[tuple]):
+    """ Write the (id, object) pairs objs to file f as one JSON object
+    Raw records are written as they are, without decoding them
+    """
+    f.write("{")
+    for i, (obj_id, obj) in enumerate(objs):
+        f.write("{}{}: {}".format(
+            ", " if i else "", json.dumps(obj_id),
+            obj if type(obj) is str else json.dumps(obj.to_json(True))))
+    f.write("}")
+
+
+def encode_record(obj_json: dict) -> bytes:
+    """ Length-prefixed binary encoding of a record
+    """
+    data = marshal.dumps(obj_json)
+    return BINARY_LENGTH.pack(len(data)) + data
+
+
+def read_record(mapped: mmap.mmap, offset: int) -> dict:
+    """ Decode the binary record at offset
+    """
+    length, = BINARY_LENGTH.unpack_from(mapped, offset)
+    start = offset + BINARY_LENGTH.size
+    return marshal.loads(mapped[start:start + length])
+
+
+def record_bytes(mapped: mmap.mmap, offset: int) -> bytes:
+    """ The binary record at offset, length prefix included
+    """
+    length, = BINARY_LENGTH.unpack_from(mapped, offset)
+    return mapped[offset:offset + BINARY_LENGTH.size + length]
+
+
+def dump_binary(f, records: Iterable[tuple], attributes: tuple) -> dict:
+    """ Write the (id, encoded record, indexed values) triples records
+    to binary file f, return the offset of each id
+    The records are followed by an index mapping each id to its offset
+    and to the values of attributes, then by the index offset
+    """
+    f.write(BINARY_MAGIC)
+    offset, offsets = len(BINARY_MAGIC), {}
+    columns = [[] for _ in attributes]
+    for obj_id, data, values in records:
+        f.write(data)
+        offsets[obj_id] = offset
+        offset += len(data)
+        for column, value in zip(columns, values):
+            column.append(value)
+    f.write(marshal.dumps((attributes, list(offsets), list(offsets.values()),
+                           columns)))
+    f.write(BINARY_FOOTER.pack(offset, BINARY_MAGIC))
+    return offsets
+
+
+def read_binary_index(mapped: mmap.mmap) -> tuple:
+    """ (indexed attributes, ids, offsets, one list of values per indexed
+    attribute) of a binary snapshot
+    """
+    offset, magic = BINARY_FOOTER.unpack_from(
+        mapped, len(mapped) - BINARY_FOOTER.size)
+    if magic != BINARY_MAGIC or mapped[:len(BINARY_MAGIC)] != BINARY_MAGIC:
+        raise ValueError("Not a binary snapshot")
+    return marshal.loads(mapped[offset:len(mapped) - BINARY_FOOTER.size])
+
+
+def read_json_shard(file_path: str, attributes: tuple) -> tuple:
+    """ Ids, raw JSON texts and values of attributes of the records of a
+    JSON snapshot, as three lists; run in worker processes to load shards
+    in parallel, lists being cheaper to send back than a tuple per record
+    """
+    ids, raws, values = [], [], []
+    with open(file_path, 'r') as f:
+        for obj_id, obj_json, raw in iter_json_object(f):
+            ids.append(obj_id)
+            raws.append(raw)
+            values.append(tuple(obj_json.get(attr) for attr in attributes))
+    return ids, raws, values
+
+
+def map_file(file_path: str) -> mmap.mmap:
+    """ Read-only memory map of the whole file
+    """
+    with open(file_path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+""" SQLiteStorage module
+"""
+from datetime import datetime
+from os import getenv
+from typing import TypeVar, List, Iterator
+import json
+import os
+import sqlite3
+import threading
+
+from models.base import BATCH, TIMESTAMP_FORMAT, matches, paginate, \
+    parse_filters
+from models.engine.storage import Storage
+
+
+SQL_OPERATORS = {
+    "eq": "IS",
+    "ne": "IS NOT",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+}
+
+
+class SQLiteStorage(Storage):
+    """ Objects stored in a SQLite database (DB_SQLITE_PATH, default
+    .db.sqlite3), one table per class with a column per attribute and
+    an index per indexed attribute
+    """
+
+    def __init__(self):
+        """ Initialize a SQLiteStorage instance
+        """
+        self.db_path = getenv("DB_SQLITE_PATH", ".db.sqlite3")
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.columns = {}
+
+    def connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread, opened again after a fork
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def table(self, cls) -> List[str]:
+        """ Create the table of cls if needed, return its columns
+        """
+        s_class = cls.__name__
+        columns = self.columns.get(s_class)
+        if columns is not None:
+            return columns
+        with self.lock:
+            conn = self.connection()
+            conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                         '(id TEXT PRIMARY KEY)'.format(s_class))
+            columns = [row["name"] for row in conn.execute(
+                'PRAGMA table_info("{}")'.format(s_class))]
+            for column in cls().to_json(True):
+                if column not in columns:
+                    self.add_column(conn, s_class, column)
+                    columns.append(column)
+            for attr in cls.indexed_attributes:
+                conn.execute('CREATE INDEX IF NOT EXISTS "{0}_{1}" '
+                             'ON "{0}" ("{1}")'.format(s_class, attr))
+            conn.commit()
+            self.columns[s_class] = columns
+        return columns
+
+    @staticmethod
+    def add_column(conn: sqlite3.Connection, s_class: str, column: str):
+        """ Add the column to the table s_class, unless another process
+        just did
+        """
+        try:
+            conn.execute('ALTER TABLE "{}" ADD COLUMN "{}"'.format(
+                s_class, column))
+        except sqlite3.OperationalError as error:
+            if "duplicate column" not in str(error):
+                raise
+
+    @staticmethod
+    def to_column(value):
+        """ Value stored for an attribute value: datetimes as in
+        to_json(), other non scalar values as JSON
+        """
+        if type(value) is datetime:
+            return value.strftime(TIMESTAMP_FORMAT)
+        if value is None or type(value) in (str, int, float, bool):
+            return value
+        return json.dumps(value)
+
+    def commit(self, conn: sqlite3.Connection):
+        """ Commit, unless inside a Base.batch() block
+        """
+        if getattr(BATCH, "depth", 0) == 0:
+            conn.commit()
+
+    def load(self, cls):
+        """ Create the table of cls
+        """
+        self.table(cls)
+
+    def save_to_file(self, cls):
+        """ Commit the rows of cls; each save already wrote its own
+        """
+        self.flush()
+
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update obj with a single upsert
+        """
+        cls = obj.__class__
+        columns = self.table(cls)
+        values = obj.to_json(True)
+        conn = self.connection()
+        for column in values:
+            if column not in columns:
+                with self.lock:
+                    self.add_column(conn, cls.__name__, column)
+                    columns.append(column)
+        names = ", ".join('"{}"'.format(key) for key in values)
+        conn.execute(
+            'INSERT INTO "{}" ({}) VALUES ({}) ON CONFLICT(id) DO UPDATE '
+            'SET {}'.format(
+                cls.__name__, names, ", ".join("?" * len(values)),
+                ", ".join('"{0}" = excluded."{0}"'.format(key)
+                          for key in values if key != "id")),
+            [self.to_column(value) for value in values.values()])
+        self.commit(conn)
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of obj
+        """
+        cls = obj.__class__
+        self.table(cls)
+        conn = self.connection()
+        conn.execute('DELETE FROM "{}" WHERE id = ?'.format(cls.__name__),
+                     (obj.id,))
+        self.commit(conn)
+
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Return one object by ID
+        """
+        self.table(cls)
+        row = self.connection().execute(
+            'SELECT * FROM "{}" WHERE id = ?'.format(cls.__name__),
+            (obj_id,)).fetchone()
+        return None if row is None else cls(**dict(row))
+
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Search all objects with matching attributes
+        Attributes stored in columns are matched in SQL, others on the
+        built objects
+        """
+        columns = self.table(cls)
+        where, params, rest = [], [], {}
+        for k, v in attributes.items():
+            if k in columns:
+                where.append('"{}" IS ?'.format(k))
+                params.append(self.to_column(v))
+            else:
+                rest[k] = v
+        query = 'SELECT * FROM "{}"'.format(cls.__name__)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        objs = [cls(**dict(row))
+                for row in self.connection().execute(query, params)]
+        return [obj for obj in objs
+                if all(getattr(obj, k) == v for k, v in rest.items())]
+
+    def query(self, cls, filters: dict, order_by: str, limit: int,
+              offset: int) -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the rows matching the filters
+        Filters, ordering and paging on columns run in SQL, the rest on
+        the built objects
+        """
+        columns = self.table(cls)
+        where, params, rest = [], [], []
+        for attr, op, arg in parse_filters(filters):
+            column = '"{}"'.format(attr)
+            if attr not in columns or \
+                    op == "startswith" and type(arg) is not str:
+                rest.append((attr, op, arg))
+            elif op == "in":
+                args = [self.to_column(value) for value in arg]
+                test = "{} IN ({})".format(column, ", ".join("?" * len(args)))
+                if None in args:
+                    test = "({} OR {} IS NULL)".format(test, column)
+                where.append(test)
+                params.extend(args)
+            elif op == "startswith" and arg:
+                # A range, which unlike LIKE uses the index
+                where.append("{0} >= ? AND {0} < ?".format(column))
+                params.extend((arg, arg[:-1] + chr(ord(arg[-1]) + 1)))
+            elif op == "startswith":
+                where.append("{} IS NOT NULL".format(column))
+            else:
+                where.append("{} {} ?".format(column, SQL_OPERATORS[op]))
+                params.append(self.to_column(arg))
+
+        query = 'SELECT * FROM "{}"'.format(cls.__name__)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        attr = (order_by or "").lstrip("-")
+        if attr in columns:
+            direction = " DESC" if order_by.startswith("-") else ""
+            query += ' ORDER BY "{0}" IS NULL{1}, "{0}"{1}'.format(
+                attr, direction)
+            order_by = None
+        if not rest and not order_by:
+            query += " LIMIT ? OFFSET ?"
+            params.extend((-1 if limit is None else limit, offset))
+            limit, offset = None, 0
+
+        objs = (cls(**dict(row))
+                for row in self.connection().execute(query, params))
+        if rest:
+            objs = (obj for obj in objs
+                    if all(matches(getattr(obj, attr), op, arg)
+                           for attr, op, arg in rest))
+        return paginate(objs, order_by, limit, offset)
+
+    def count(self, cls) -> int:
+        """ Count all objects
+        """
+        self.table(cls)
+        return self.connection().execute(
+            'SELECT COUNT(*) FROM "{}"'.format(cls.__name__)).fetchone()[0]
+
+    def flush(self, wait: bool = False):
+        """ Commit the changes made in a Base.batch() block; nothing runs
+        in the background to wait for
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is not None and self.local.pid == os.getpid():
+            conn.commit()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+""" Storage module
+"""
+from abc import ABC, abstractmethod
+from typing import TypeVar, List, Iterator
+
+
+class Storage(ABC):
+    """ Interface of the backends holding Base objects
+    """
+
+    @abstractmethod
+    def load(self, cls):
+        """ Prepare the storage of the class cls before first use
+        """
+
+    @abstractmethod
+    def save_to_file(self, cls):
+        """ Write all objects of the class cls to the backing store
+        """
+
+    @abstractmethod
+    def save(self, obj: TypeVar('Base')):
+        """ Store the object obj, inserted or updated by id
+        """
+
+    @abstractmethod
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the object obj
+        """
+
+    @abstractmethod
+    def get(self, cls, obj_id: str) -> TypeVar('Base'):
+        """ Return the object of class cls with id obj_id, or None
+        """
+
+    @abstractmethod
+    def search(self, cls, attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects of class cls with matching attributes
+        """
+
+    @abstractmethod
+    def query(self, cls, filters: dict, order_by: str, limit: int,
+              offset: int) -> Iterator[TypeVar('Base')]:
+        """ Iterate lazily over the objects of class cls matching the
+        filters, see Base.query()
+        """
+
+    @abstractmethod
+    def count(self, cls) -> int:
+        """ Count the objects of class cls
+        """
+
+    @abstractmethod
+    def flush(self, wait: bool = False):
+        """ Write the changes held back by Base.batch(); with wait, also
+        wait for background work on the files, as at exit
+        """
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 """A UserSession class module."""
 
+import sys
 from models.base import Base
 
 
 class UserSession(Base):
     """Model for storing User session data."""
 
+    __slots__ = ('user_id', 'session_id')
+    indexed_attributes = ('session_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """Initialize a UserSession instance."""
         super().__init__(*args, **kwargs)
-        self.user_id = kwargs.get('user_id')
+        user_id = kwargs.get('user_id')
+        # Sessions of one user share a single copy of its id
+        self.user_id = sys.intern(user_id) if type(user_id) is str \
+            else user_id
         self.session_id = kwargs.get('session_id')